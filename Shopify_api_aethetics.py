@@ -3,12 +3,16 @@
 
 # Step 1: Import libraries
 import os
-import base64
 import requests
 import json
 from dotenv import load_dotenv
 from pathlib import Path
 
+from utils.asset_bundler import add_bundle_tags, build_bundles
+from utils.streaming_body import asset_attachment_body
+from utils.theme_mirror import get_theme_mirror
+from utils.theme_transform import ThemeTransform
+
 # Step 2: Load environment variables from .env in the current directory
 dotenv_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path)
@@ -42,19 +46,12 @@ def upload_asset(filename, subfolder="assets"):
         print(f"❌ File not found: {path}")
         return False
 
-    with open(path, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode("utf-8")
-
     asset_key = f"{subfolder}/{filename}"
     url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    payload = {
-        "asset": {
-            "key": asset_key,
-            "attachment": encoded
-        }
-    }
+    # The base64 attachment is streamed from disk instead of built in memory
+    body = asset_attachment_body(asset_key, path)
 
-    response = requests.put(url, headers=HEADERS, json=payload)
+    response = requests.put(url, headers=HEADERS, data=body)
     if response.status_code == 200:
         print(f"✅ Uploaded {filename} to {subfolder}/")
         return True
@@ -63,15 +60,12 @@ def upload_asset(filename, subfolder="assets"):
         print(response.text)
         return False
 
-# Step 5: Get theme.liquid
+# Step 5: Get theme.liquid (served from the local theme mirror while it is current)
 def get_theme_liquid():
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    response = requests.get(url, headers=HEADERS, params={"asset[key]": "layout/theme.liquid"})
-    if response.status_code == 200:
-        return response.json().get("asset", {}).get("value", "")
-    else:
-        print(f"❌ Failed to fetch theme.liquid: {response.status_code}")
-        return None
+    content = get_theme_mirror(THEME_ID).get("layout/theme.liquid")
+    if content is None:
+        print("❌ Failed to fetch theme.liquid")
+    return content
 
 # Step 6: Inject background image and refresh script
 def inject_background_and_prompt(content, version="v2"):
@@ -98,6 +92,10 @@ def inject_background_and_prompt(content, version="v2"):
   }}
 </script>"""
 
+    if style in content and script in content:
+        print("ℹ️ Background and refresh prompt already present.")
+        return content
+
     lines = content.splitlines()
     lines = [line for line in lines if "background.jpg" not in line]
     content = "\n".join(lines)
@@ -154,19 +152,10 @@ def inject_button_styles(content):
 
 # Step 10: Push updated theme.liquid
 def update_theme_liquid(new_content):
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    payload = {
-        "asset": {
-            "key": "layout/theme.liquid",
-            "value": new_content
-        }
-    }
-    response = requests.put(url, headers=HEADERS, json=payload)
-    if response.status_code == 200:
+    if get_theme_mirror(THEME_ID).put("layout/theme.liquid", new_content):
         print("✅ theme.liquid updated.")
     else:
-        print(f"❌ theme.liquid update failed: {response.status_code}")
-        print(response.text)
+        print("❌ theme.liquid update failed")
 
 # Step 11: Create promo section
 def create_seasonal_sale_section(image_filename="summer_sale_banner.jpg"):
@@ -197,14 +186,11 @@ def create_seasonal_sale_section(image_filename="summer_sale_banner.jpg"):
 
 # Step 12: Inject promo section into homepage
 def inject_seasonal_sale_into_index():
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    response = requests.get(url, headers=HEADERS, params={"asset[key]": "templates/index.json"})
-    if response.status_code != 200:
-        print(f"❌ Failed to fetch index.json: {response.status_code}")
-        print(response.text)
+    mirror = get_theme_mirror(THEME_ID)
+    index_data = mirror.get("templates/index.json")
+    if index_data is None:
+        print("❌ Failed to fetch index.json")
         return
-
-    index_data = response.json().get("asset", {}).get("value", "")
     if not index_data:
         print("❌ index.json is empty.")
         return
@@ -216,29 +202,21 @@ def inject_seasonal_sale_into_index():
         index_json["order"].append(section_id)
     else:
         print("ℹ️ seasonal-sale already exists.")
+        return
 
-    payload = {
-        "asset": {
-            "key": "templates/index.json",
-            "value": json.dumps(index_json, indent=2)
-        }
-    }
-    put_response = requests.put(url, headers=HEADERS, json=payload)
-    if put_response.status_code == 200:
+    if mirror.put("templates/index.json", json.dumps(index_json, indent=2)):
         print("✅ seasonal-sale added to homepage.")
     else:
-        print(f"❌ Failed to update index.json: {put_response.status_code}")
-        print(put_response.text)
+        print("❌ Failed to update index.json")
 
 # Step 13: Inject scrolling text banner
 def inject_scrolling_text():
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    response = requests.get(url, headers=HEADERS, params={"asset[key]": "templates/index.liquid"})
-    if response.status_code != 200:
+    mirror = get_theme_mirror(THEME_ID)
+    content = mirror.get("templates/index.liquid")
+    if content is None:
         print("❌ Failed to fetch index.liquid")
         return
 
-    content = response.json().get("asset", {}).get("value", "")
     banner_html = '''
 <!-- Scrolling Text Banner Start -->
 <div class="scrolling-text-banner">
@@ -252,14 +230,7 @@ def inject_scrolling_text():
 '''
     if 'scrolling-text-banner' not in content:
         content = content.replace("</body>", f"{banner_html}\n</body>")
-        payload = {
-            "asset": {
-                "key": "templates/index.liquid",
-                "value": content
-            }
-        }
-        put_response = requests.put(url, headers=HEADERS, json=payload)
-        if put_response.status_code == 200:
+        if mirror.put("templates/index.liquid", content):
             print("✅ Scrolling banner injected.")
         else:
             print("❌ Failed to inject scrolling banner")
@@ -267,14 +238,7 @@ def inject_scrolling_text():
         print("ℹ️ Scrolling banner already exists.")
 
 # Step 14: Inject splash screen loader
-def inject_loader():
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    response = requests.get(url, headers=HEADERS, params={"asset[key]": "layout/theme.liquid"})
-    if response.status_code != 200:
-        print("❌ Failed to fetch theme.liquid")
-        return
-
-    content = response.json().get("asset", {}).get("value", "")
+def inject_loader_markup(content):
     loader_html = '''
 <!-- Splash Screen Loader Start -->
 <div class="splash-screen"><span class="loader-text">Loading</span></div>
@@ -283,46 +247,54 @@ def inject_loader():
     if 'splash-screen' not in content:
         content = content.replace("<body", "<body class=\"transition-body\"")
         content = content.replace("</body>", f"{loader_html}\n</body>")
-        update_theme_liquid(content)
         print("✅ Splash screen loader injected.")
     else:
         print("ℹ️ Splash screen already exists.")
+    return content
+
+def inject_loader():
+    ThemeTransform("layout/theme.liquid", THEME_ID).register(inject_loader_markup).run()
+
+# Step 15: Upload animation/styling assets, as the same hashed bundles deploy.py's
+# Steps 14-15 upload and tag (utils/asset_bundler.py), so the two scripts
+# replace each other's tags instead of stacking both sets in theme.liquid
+ANIMATION_FILES = ["scrolling-banner.css", "loader.css", "aos.css", "aos.js"]
+BUNDLE_NAME = "aesthetics"
+
+def upload_animation_bundles():
+    bundles = build_bundles(ANIMATION_FILES, ASSET_FOLDER, name=BUNDLE_NAME)
+    for bundle in bundles:
+        upload_asset(bundle)
+    return bundles
 
-# Step 15: Upload animation/styling assets
 def upload_animation_assets():
-    files = ["scrolling-banner.css", "loader.css", "aos.css", "aos.js"]
-    for file in files:
-        upload_asset(file)
-
-    theme = get_theme_liquid()
-    if theme:
-        injection_block = "\n".join([
-            f'<link href="{{{{ "/assets/{f}" | asset_url }}}}" rel="stylesheet">' if f.endswith(".css")
-            else f'<script src="{{{{ "/assets/{f}" | asset_url }}}}" defer></script>' for f in files
-        ])
-        if injection_block not in theme:
-            updated = theme.replace("</head>", f"{injection_block}\n</head>")
-            update_theme_liquid(updated)
-            print("✅ Animation assets injected.")
-        else:
-            print("ℹ️ Animation assets already present.")
+    bundles = upload_animation_bundles()
+    (ThemeTransform("layout/theme.liquid", THEME_ID)
+     .register(add_bundle_tags, bundles, name=BUNDLE_NAME, replaces=ANIMATION_FILES)
+     .run())
+
+# Every theme.liquid edit of the full process, applied to one read and sent as one upload
+def theme_liquid_pipeline(bundles, version="v2"):
+    return (ThemeTransform("layout/theme.liquid", THEME_ID)
+            .register(inject_background_and_prompt, version=version)
+            .register(inject_favicon_into_theme, "favicon.ico")
+            .register(inject_google_fonts)
+            .register(inject_button_styles)
+            .register(inject_loader_markup)
+            .register(add_bundle_tags, bundles, name=BUNDLE_NAME, replaces=ANIMATION_FILES))
 
 # Step 16: Run full process
 if __name__ == "__main__":
+    # One listing brings the local mirror up to date; every read below is served from it
+    get_theme_mirror(THEME_ID).pull(["layout/theme.liquid", "templates/index.json", "templates/index.liquid"])
+
     upload_asset("background.jpg")
     upload_asset("favicon.ico")
     upload_asset("summer_sale_banner.jpg")
+    bundles = upload_animation_bundles()
 
-    current = get_theme_liquid()
-    if current:
-        updated = inject_background_and_prompt(current, version="v2")
-        updated = inject_favicon_into_theme(updated, "favicon.ico")
-        updated = inject_google_fonts(updated)
-        updated = inject_button_styles(updated)
-        update_theme_liquid(updated)
+    theme_liquid_pipeline(bundles, version="v2").run()
 
     create_seasonal_sale_section("summer_sale_banner.jpg")
     inject_seasonal_sale_into_index()
     inject_scrolling_text()
-    inject_loader()
-    upload_animation_assets()
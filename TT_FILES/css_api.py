@@ -9,6 +9,9 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 os.environ['SSL_CERT_FILE'] = certifi.where()
 
 import csv
+import hashlib
+import re
+import time
 import requests
 import json
 
@@ -34,20 +37,86 @@ CSV_PATH = os.path.join(STYLE_FOLDER, STYLE_CSV_FILE)
 CSS_PATH = os.path.join(STYLE_FOLDER, GENERATED_CSS_FILE)
 ASSET_KEY = f"assets/{GENERATED_CSS_FILE}"
 
+# Hash of the CSV last compiled, hash of the CSS last pushed (per theme)
+# and the memoized active theme ID with the time it was looked up
+CACHE_PATH = os.path.join(STYLE_FOLDER, ".css_api_cache.json")
+THEME_ID_TTL = 3600  # seconds before themes.json is asked again
+
+# -------------------------------------------
+# Build cache
+# -------------------------------------------
+def load_cache(path=CACHE_PATH):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_cache(cache, path=CACHE_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+
+def sha256_of(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+# -------------------------------------------
+# Validate CSS variables
+# -------------------------------------------
+VARIABLE_PATTERN = re.compile(r"^--[A-Za-z0-9_-]+$")
+
+def validate_variable(variable, value):
+    """Return a problem description, or None if the pair is a usable custom property."""
+    if not VARIABLE_PATTERN.match(variable):
+        return f"invalid variable name {variable!r} (expected --name)"
+    if not value:
+        return f"{variable} has no value"
+    if any(c in value for c in ";{}"):
+        return f"{variable} value {value!r} contains ';', '{{' or '}}'"
+    if value.count("(") != value.count(")") or value.count('"') % 2 or value.count("'") % 2:
+        return f"{variable} value {value!r} has unbalanced brackets or quotes"
+    return None
+
 # -------------------------------------------
 # Convert CSV to CSS string
 # -------------------------------------------
-def build_css_from_csv(csv_path):
-    css_lines = [":root {"]
+def build_css_from_csv(csv_path, minify=True):
+    declarations, errors = [], []
     with open(csv_path, mode="r", encoding="utf-8") as file:
         reader = csv.DictReader(file)
-        for row in reader:
-            variable = row["variable"].strip()
-            value = row["value"].strip()
-            css_lines.append(f"  {variable}: {value};")
-    css_lines.append("}")
+        for line, row in enumerate(reader, start=2):
+            variable = (row["variable"] or "").strip()
+            value = re.sub(r"\s+", " ", (row["value"] or "").strip())
+            problem = validate_variable(variable, value)
+            if problem:
+                errors.append(f"line {line}: {problem}")
+            else:
+                declarations.append((variable, value))
+    if errors:
+        raise ValueError("Invalid theme variables:\n" + "\n".join(errors))
+
+    if minify:
+        return ":root{" + ";".join(f"{variable}:{value}" for variable, value in declarations) + "}"
+    css_lines = [":root {"] + [f"  {variable}: {value};" for variable, value in declarations] + ["}"]
     return "\n".join(css_lines)
 
+# -------------------------------------------
+# Compile CSS only when the CSV changed
+# -------------------------------------------
+def compile_css(csv_path, css_path, cache):
+    with open(csv_path, "rb") as f:
+        csv_hash = sha256_of(f.read())
+    if cache.get("csv_sha256") == csv_hash and os.path.exists(css_path):
+        print("➖ theme_variables.csv unchanged; reusing compiled CSS.")
+        with open(css_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    css_content = build_css_from_csv(csv_path)
+    save_css_file(css_content, css_path)
+    cache["csv_sha256"] = csv_hash
+    print(f"✅ Compiled {len(css_content)} bytes of CSS.")
+    return css_content
+
 # -------------------------------------------
 # Save CSS content to file
 # -------------------------------------------
@@ -58,7 +127,17 @@ def save_css_file(content, path):
 # -------------------------------------------
 # Get active theme ID (debugging included)
 # -------------------------------------------
-def get_active_theme_id():
+def get_active_theme_id(cache=None):
+    """The main theme's ID, reused from the cache for THEME_ID_TTL seconds."""
+    cache = cache if cache is not None else {}
+    if cache.get("theme_id") and time.time() - cache.get("theme_id_fetched_at", 0) < THEME_ID_TTL:
+        return cache["theme_id"]
+    theme_id = fetch_active_theme_id()
+    cache["theme_id"] = theme_id
+    cache["theme_id_fetched_at"] = time.time()
+    return theme_id
+
+def fetch_active_theme_id():
     url = f"https://{SHOP_NAME}/admin/api/{API_VERSION}/themes.json"
     headers = {
         "X-Shopify-Access-Token": ACCESS_TOKEN,
@@ -85,11 +164,17 @@ def get_active_theme_id():
 # -------------------------------------------
 # Upload CSS to Shopify
 # -------------------------------------------
-def upload_css_to_shopify(css_path):
+def upload_css_to_shopify(css_path, cache=None):
+    cache = cache if cache is not None else {}
     with open(css_path, "r", encoding="utf-8") as file:
         css_content = file.read()
 
-    theme_id = get_active_theme_id()
+    theme_id = get_active_theme_id(cache)
+    pushed = cache.setdefault("pushed", {})
+    css_hash = sha256_of(css_content)
+    if pushed.get(str(theme_id)) == css_hash:
+        print("➖ CSS unchanged since the last upload; skipping.")
+        return True
     url = f"https://{SHOP_NAME}/admin/api/{API_VERSION}/themes/{theme_id}/assets.json"
     headers = {
         "X-Shopify-Access-Token": ACCESS_TOKEN,
@@ -105,10 +190,13 @@ def upload_css_to_shopify(css_path):
 
     response = requests.put(url, headers=headers, data=json.dumps(payload), verify=False)
     if response.status_code == 200:
+        pushed[str(theme_id)] = css_hash
         print("✅ CSS uploaded successfully.")
+        return True
     else:
         print(f"❌ Upload failed: {response.status_code}")
         print(response.json())
+        return False
 
 # -------------------------------------------
 # Main script
@@ -118,9 +206,12 @@ if __name__ == "__main__":
         if not os.path.exists(CSV_PATH):
             raise FileNotFoundError(f"CSV file not found at {CSV_PATH}")
 
-        css_content = build_css_from_csv(CSV_PATH)
-        save_css_file(css_content, CSS_PATH)
-        upload_css_to_shopify(CSS_PATH)
+        cache = load_cache()
+        try:
+            compile_css(CSV_PATH, CSS_PATH, cache)
+            upload_css_to_shopify(CSS_PATH, cache)
+        finally:
+            save_cache(cache)
 
     except Exception as e:
         print(f"Error: {e}")
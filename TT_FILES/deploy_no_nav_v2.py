@@ -49,7 +49,7 @@ for idx, row in page_sku_df.iterrows():
     sku = row['SKU']
     page_name = row['Page Name']
     product_id = find_product_id_by_sku(sku)
-    collection_id = find_collection_id_by_title(page_name)
+    collection_id = find_collection_id_by_title(page_name, include_smart=False)
 
     if product_id and collection_id:
         add_product_to_collection(product_id, collection_id)
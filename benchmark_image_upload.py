@@ -0,0 +1,121 @@
+# benchmark_image_upload.py
+# Compares the two product image upload paths on a folder of images:
+#   base64  - upload_local_image_to_product(): the file base64-encoded into a
+#             JSON body (streamed from disk by utils/streaming_body.py)
+#   staged  - upload_product_images_staged(): the raw file streamed to a
+#             staged target, then attached by productCreateMedia
+#
+#   python benchmark_image_upload.py                        # against a local sink
+#   python benchmark_image_upload.py --product-id 123456    # also time real uploads
+#
+# Offline mode sends every file through the shipped helpers
+# (upload_local_image_to_product and upload_to_staged_target) to an HTTP
+# server on localhost that reads and discards the bodies, so it measures
+# the real request path minus the network and Shopify's processing.
+# Live mode adds the images to the given product twice (once per path);
+# point it at a scratch product.
+
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+from utils.shopify_api import image_view_name, upload_local_image_to_product
+from utils.shopify_client import ShopifyClient
+from utils.staged_uploads import upload_product_images_staged, upload_to_staged_target
+
+# Load environment variables from .env
+load_dotenv()
+
+SINK_CHUNK = 64 * 1024  # bytes the sink reads at a time
+
+
+def image_files(folder):
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".webp"))
+    )
+
+
+class Sink(BaseHTTPRequestHandler):
+    """Reads and discards request bodies, counting the bytes; answers like Shopify would."""
+
+    received = 0
+
+    def _drain(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            chunk = self.rfile.read(min(SINK_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            Sink.received += len(chunk)
+        body = json.dumps({"image": {"id": 1}}).encode("utf-8")
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_PUT = _drain
+
+    def log_message(self, *args):
+        pass
+
+
+def start_sink():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Sink)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def measure(label, send, paths):
+    """Send every path through `send`; print seconds, bytes received by the sink and peak memory."""
+    Sink.received = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    for position, path in enumerate(paths, start=1):
+        send(path, position)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f" - {label:<7} {seconds * 1000:8.1f} ms  {Sink.received / 1024:9.1f} KiB sent  "
+          f"{peak / 1024:9.1f} KiB peak memory")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark base64 vs staged image uploads.")
+    parser.add_argument("--folder", default=os.path.join("ASI_FILES", "images"))
+    parser.add_argument("--product-id", help="scratch product to time real uploads against")
+    args = parser.parse_args()
+
+    paths = image_files(args.folder)
+    total = sum(os.path.getsize(p) for p in paths)
+    print(f"\n🖼️ {len(paths)} image(s), {total / 1024:.1f} KiB on disk in {args.folder}")
+
+    server, sink_url = start_sink()
+    sink_client = ShopifyClient(store_url=sink_url, access_token="benchmark", max_retries=0)
+    staged_target = {"url": f"{sink_url}/staged", "parameters": []}
+    print("\n⏱️ Shipped upload helpers against a local sink:")
+    measure("base64", lambda path, position: upload_local_image_to_product(0, path, position,
+                                                                        client=sink_client), paths)
+    measure("staged", lambda path, _: upload_to_staged_target(staged_target, path), paths)
+    server.shutdown()
+
+    if args.product_id:
+        print("\n⏱️ Live upload:")
+        started = time.perf_counter()
+        for position, path in enumerate(paths, start=1):
+            upload_local_image_to_product(args.product_id, path, position)
+        print(f" - base64  {time.perf_counter() - started:8.2f} s  ({len(paths)} REST calls)")
+
+        started = time.perf_counter()
+        upload_product_images_staged(
+            args.product_id,
+            [(path, image_view_name(position)) for position, path in enumerate(paths, start=1)])
+        print(f" - staged  {time.perf_counter() - started:8.2f} s  "
+              f"(2 GraphQL calls + {len(paths)} streamed PUTs)")
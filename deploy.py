@@ -2,330 +2,830 @@
 
 # Load Libraries
 import os
+import re
+import csv
+import argparse
+from functools import lru_cache
 import pandas as pd
-import requests
 from dotenv import load_dotenv
 
 # Load shopify_api Library
 from utils.shopify_api import (
     create_product,
+    update_product,
     create_collection,
+    update_collection,
     find_product_id_by_sku,
+    load_sku_index,
+    sku_index_complete,
     find_collection_id_by_title,
-    add_product_to_collection,
-    upload_local_image_to_product,
-    upload_local_image_to_product_with_alt,
     create_page,
+    update_page,
     find_navigation_menu_id_by_title,
     find_product_id_by_title,
     find_page_id_by_title,
     add_link_to_navigation_menu,
+    replace_link_in_navigation_menu,
     upload_theme_asset,
     upload_asset,
-    inject_assets_into_theme,
     #inject_scrolling_banner,
-    inject_splash_screen,
+    add_splash_screen,
     upload_hover_snippets_from_csv,
     insert_multiple_snippets_into_theme_file
 )
-
-# Step 0: Load environment variables and Shopify REST session
+from utils.asset_bundler import add_bundle_tags, build_bundles
+from utils.bulk_operations import bulk_create_products, legacy_id, load_catalog_index
+from utils.collection_sync import sync_collection_members
+from utils.csv_manifest import CsvManifest
+from utils.image_optimizer import optimize_image, optimize_images
+from utils.image_plan import build_image_plan, reconcile_product_images
+from utils.image_registry import ImageRegistry
+from utils.journal import DeployJournal
+from utils.product_upsert import upsert_product
+from utils.smart_collections import (add_product_tags, create_smart_collection, detect_collection_rules,
+                                     load_smart_collections, rule_tags, same_rules, subcategory_tag,
+                                     update_smart_collection)
+from utils.shopify_client import get_default_client
+from utils.step_graph import StepGraph
+from utils.theme_mirror import get_theme_mirror
+from utils.theme_transform import ThemeTransform
+from utils.theme_sync import md5_checksum, remote_asset_checksums
+from utils.upload_pool import DEFAULT_UPLOAD_WORKERS, ThroughputMeter, run_in_pool
+
+# Step 0: Load environment variables and the shared Shopify client
 load_dotenv()
 
-SHOPIFY_STORE_URL = os.getenv('SHOPIFY_STORE_URL')
-SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN')
-SHOPIFY_API_VERSION = os.getenv('SHOPIFY_API_VERSION', '2023-04')
 FOLDER = os.getenv('FOLDER')
 THEME_ID = os.getenv('THEME_ID')
 
-# Create Shopify REST session
-session = requests.Session()
-session.headers.update({
-    "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN,
-    "Content-Type": "application/json"
-})
-session.shop = SHOPIFY_STORE_URL.replace("https://", "")
-
-HEADERS = {
-    "Content-Type": "application/json",
-    "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
+# Steps allowed to run at the same time (they share one client and rate limiter)
+MAX_PARALLEL_STEPS = 4
+
+# Product image preprocessing (utils/image_optimizer.py); `--no-optimize` skips it
+IMAGE_SETTINGS = {
+    "max_dimension": int(os.getenv("IMAGE_MAX_DIMENSION", 2048)),
+    "webp": os.getenv("IMAGE_WEBP", "false").lower() == "true",
 }
+optimize = True  # set in __main__
+
+# `--bulk-import`: new products are created by one bulk operation (Step 2)
+bulk_import = False  # set in __main__
+
+# `--upsert`: each product is created or updated by one GraphQL mutation that
+# also carries its SEO fields, collections and images (Step 2)
+upsert = False  # set in __main__
+
+# `--smart-collections`: collections whose members all share one Category,
+# Brand or Subcategory become rule-based smart collections (Step 3)
+smart_collections = False  # set in __main__
+
+# Products whose images upload at the same time (`--image-workers`)
+IMAGE_UPLOAD_WORKERS = int(os.getenv("IMAGE_UPLOAD_WORKERS", DEFAULT_UPLOAD_WORKERS))
+
+# One pooled client for every API call in this run (utils/shopify_client.py)
+client = get_default_client()
+session = client.session
+session.shop = client.store_url.replace("https://", "")
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 def csv_path(filename): return os.path.join(BASE_DIR, FOLDER, "csv", filename)
 def image_path(filename): return os.path.join(BASE_DIR, FOLDER, "images", filename)
 def theme_file_path(filename): return os.path.join(BASE_DIR, FOLDER, "theme_files", filename)
 
+# Checkpoint journal of completed work; `python deploy.py --resume` skips
+# everything recorded here and reuses the IDs it holds.
+JOURNAL_PATH = os.path.join(BASE_DIR, FOLDER, "journal", "deploy_journal.jsonl")
+journal = None  # opened in __main__
+
+# Content hash -> products that already hold the image; duplicates are
+# skipped or turned into ALT updates instead of new transfers.
+IMAGE_REGISTRY_PATH = os.path.join(BASE_DIR, FOLDER, "journal", "image_registry.json")
+image_registry = None  # opened in __main__
+
+# Variables file staged for `--bulk-import`
+BULK_IMPORT_PATH = os.path.join(BASE_DIR, FOLDER, "journal", "bulk_products.jsonl")
+
+# `--bulk-index`: the catalog export (utils/bulk_operations.CatalogIndex);
+# Step 4 takes collection members from it instead of reading them again
+catalog_index = None  # set in __main__
+
+# Per-row hashes of the CSVs as of the last deploy; only rows added or
+# changed since then are sent (`--full` sends every row).
+MANIFEST_PATH = csv_path("deploy_manifest.json")
+manifest = None  # opened in __main__
+
+def product_id_for(sku):
+    """Product ID from the journal when this or an earlier run created it, else the SKU index."""
+    entry = journal.get("product", sku)
+    return entry["product_id"] if entry else find_product_id_by_sku(sku)
+
+@lru_cache(maxsize=None)
+def theme_checksums():
+    """Remote asset key -> checksum, listed once and shared by the theme upload steps."""
+    return remote_asset_checksums(THEME_ID) or {}
+
+def theme_file_unchanged(asset_key, path):
+    """True if the theme already holds exactly this file, so the upload can be skipped."""
+    return theme_checksums().get(asset_key) == md5_checksum(path)
+
+def handleize(title):
+    """The handle Shopify derives from a title ("Product 1!" -> "product-1")."""
+    return "-".join(re.findall(r"[a-z0-9]+", str(title).lower()))
+
+def product_seo():
+    """
+    Product key -> {"title", "description"} from seo_metadata.csv, if it exists.
+
+    The row type is read from a `type` or `object_type` column; the `handle`
+    column of product rows holds the SKU, the product name or its handle.
+    """
+    path = csv_path('seo_metadata.csv')
+    if not os.path.exists(path):
+        return {}
+    seo = pd.read_csv(path).fillna("")
+    type_column = next((column for column in ("type", "object_type") if column in seo.columns), None)
+    if type_column is None:
+        print("⚠️ seo_metadata.csv has no type or object_type column; product SEO skipped")
+        return {}
+    products = seo[seo[type_column].astype(str).str.strip().str.lower() == "product"]
+    return {str(row['handle']).strip(): {"title": row['seo_title'], "description": row['seo_description']}
+            for _, row in products.iterrows()}
+
+def upsert_products(pending, sku_index, smart_ids):
+    """
+    Step 2 with --upsert: one productCreate/productUpdate per new or changed row.
+
+    Smart collections (`smart_ids`) are left out of the joins; their rules add the products.
+    """
+    seo = product_seo()
+    memberships = pd.read_csv(csv_path('page_sku.csv')).groupby('SKU')['Page Name'].apply(list).to_dict()
+    plan = build_image_plan(pd.read_csv(csv_path('sku_images.csv')),
+                            pd.read_csv(csv_path('sku_images_alt.csv')), skus=set(pending['SKU']))
+    for _, row in pending.iterrows():
+        sku = row['SKU']
+        if sku in sku_index and not manifest.changed('sku_master.csv', row):
+            print(f"Product with SKU {sku} exists. Skipping.")
+            journal.record("product", sku, product_id=sku_index[sku])
+            manifest.mark('sku_master.csv', row)
+            continue
+
+        collections = {}
+        for page_name in memberships.get(sku, []):
+            if page_name in smart_ids or journal.done("collect", f"{sku}|{page_name}"):
+                continue
+            entry = journal.get("collection", page_name)
+            collection_id = (entry["collection_id"] if entry
+                             else find_collection_id_by_title(page_name, include_smart=False))
+            if collection_id:
+                collections[page_name] = collection_id
+        images = []
+        for image in plan.get(sku, []):
+            img_path = image_path(image.filename)
+            if optimize and os.path.isfile(img_path):
+                img_path = optimize_image(img_path, IMAGE_SETTINGS, cache_dir=image_path(".optimized"))
+            images.append((img_path, image.alt))
+
+        keys = (sku, row['Product Name'], handleize(row['Product Name']))
+        product_seo_fields = next((seo[key] for key in keys if key in seo), None)
+        try:
+            result = upsert_product(row, images=images, seo=product_seo_fields,
+                                    collection_ids=list(collections.values()), registry=image_registry)
+        except Exception as e:
+            print(f"❌ Failed to upsert product {row['Product Name']}: {e}")
+            continue
+        if result["status"] == "failed":
+            print(f"❌ Failed to upsert product {row['Product Name']}: {'; '.join(result['errors'])}")
+            continue
+        journal.record("product", sku, product_id=result["product_id"])
+        image_registry.save()
+        for page_name in collections:
+            journal.record("collect", f"{sku}|{page_name}")
+        manifest.mark('sku_master.csv', row)
+        print(f"✅ {result['status'].capitalize()} Product: {row['Product Name']} "
+              f"({result['media']} image(s), {len(collections)} collection(s))")
+
+AESTHETIC_ASSETS = [
+    "scrolling-banner.css",
+    "loader.css",
+    "aos.css",
+    "aos.js"
+]
+# Step 14 uploads these as one minified, content-hashed bundle per type
+# (utils/asset_bundler.py), e.g. aesthetics.1a2b3c4d5e.min.css
+BUNDLE_NAME = "aesthetics"
+
+# Each step declares the artifacts it reads and writes; the graph starts a
+# step as soon as its inputs exist, so the theme branch (Steps 8, 12-16)
+# runs alongside the catalog branch (Steps 2-7).
+graph = StepGraph()
+
 # Step 1: Load CSVs
-print("\n📂 Loading CSV files...")
-products_df = pd.read_csv(csv_path('sku_master.csv'))
-collections_df = pd.read_csv(csv_path('page_url.csv'))
-page_sku_df = pd.read_csv(csv_path('page_sku.csv'))
-images_df = pd.read_csv(csv_path('sku_images.csv'))
-pages_df = pd.read_csv(csv_path('pages.csv'))
-nav_links_df = pd.read_csv(csv_path('navigation_links.csv'))
-images_alt_df = pd.read_csv(csv_path('sku_images_alt.csv'))
+@graph.step("Load CSVs", outputs=["products_df", "collections_df", "page_sku_df", "images_df",
+                                  "pages_df", "nav_links_df", "images_alt_df", "removed_rows"])
+def load_csvs():
+    print("\n📂 Loading CSV files...")
+    csv_files = {
+        "products_df": 'sku_master.csv',
+        "collections_df": 'page_url.csv',
+        "page_sku_df": 'page_sku.csv',
+        "images_df": 'sku_images.csv',
+        "pages_df": 'pages.csv',
+        "nav_links_df": 'navigation_links.csv',
+        "images_alt_df": 'sku_images_alt.csv',
+    }
+    frames, removed = {}, {}
+    for name, filename in csv_files.items():
+        diff = manifest.diff(filename, pd.read_csv(csv_path(filename)))
+        print(diff.summary())
+        if diff.removed and filename == 'page_sku.csv':
+            print(f"🗑️ Removed from {filename} (unassigned in Step 4): {', '.join(diff.removed)}")
+        elif diff.removed:
+            print(f"🗑️ Removed from {filename} (not deleted in Shopify): {', '.join(diff.removed)}")
+        frames[name] = diff.pending
+        removed[filename] = diff.removed
+    frames["removed_rows"] = removed
+    return frames
 
 # Step 2: Upload Products
-print("\n📦 Uploading Products...")
-for _, row in products_df.iterrows():
-    try:
-        create_product(row)
-        print(f"✅ Uploaded Product: {row['Product_Name']}")
-    except Exception as e:
-        print(f"❌ Failed to upload product {row['Product_Name']}: {e}")
-
+# Waits for Step 3 so that --upsert can join products to their collections as it creates them
+@graph.step("Upload Products", inputs=["products_df", "collections", "smart_collection_ids", "smart_tags"],
+            outputs=["products"])
+def upload_products(products_df, collections, smart_collection_ids, smart_tags):
+    print("\n📦 Uploading Products...")
+    journaled = products_df['SKU'].map(lambda sku: journal.done("product", sku)).astype(bool)
+    for _, row in products_df[journaled].iterrows():
+        manifest.mark('sku_master.csv', row)
+    pending = products_df[~journaled]
+    if len(pending) < len(products_df):
+        print(f"📒 {len(products_df) - len(pending)} product(s) already journaled")
+    if not len(pending):
+        return {"products": True}
+
+    sku_index = load_sku_index()  # one paginated catalog read; create_product keeps it current
+    if not sku_index_complete():
+        # SKUs on the unread pages would look new and be created a second time
+        raise RuntimeError("the SKU index is incomplete; not creating products")
+    if upsert:
+        upsert_products(pending, sku_index, smart_collection_ids)
+        tag_products(pending, smart_tags)
+        return {"products": True}
+    if bulk_import:
+        new = pending['SKU'].map(lambda sku: sku not in sku_index).astype(bool)
+        created, errors = bulk_create_products((row for _, row in pending[new].iterrows()), BULK_IMPORT_PATH)
+        for _, row in pending[new].iterrows():
+            if row['SKU'] in created:
+                journal.record("product", row['SKU'], product_id=created[row['SKU']])
+                manifest.mark('sku_master.csv', row)
+            else:
+                print(f"❌ Failed to import product {row['Product Name']}: {'; '.join(errors.get(row['SKU'], []))}")
+        pending = pending[~new]  # existing products still get per-row updates
+
+    for _, row in pending.iterrows():
+        try:
+            result = create_product(row)
+            product_id = result.get("product_id") or result.get("product", {}).get("id")
+            if result.get("status") == "exists" and manifest.changed('sku_master.csv', row):
+                result = update_product(product_id, row)
+                print(f"✏️ Updated Product: {row['Product Name']}")
+            if product_id and "errors" not in result:
+                journal.record("product", row['SKU'], product_id=product_id)
+                manifest.mark('sku_master.csv', row)
+            print(f"✅ Uploaded Product: {row['Product Name']}")
+        except Exception as e:
+            print(f"❌ Failed to upload product {row['Product Name']}: {e}")
+    tag_products(products_df[~journaled], smart_tags)  # bulk-imported rows included
+    return {"products": True}
+
+def create_rule_collections(collections_df):
+    """
+    Step 3 with --smart-collections: create or update the collections one
+    rule can fill, and fix the rules of existing ones whose sku_master.csv
+    values moved.
+
+    Returns:
+        tuple: (smart_ids, tags): Page Name -> smart collection ID for every
+        page_url.csv collection that is a smart collection on the store, and
+        the tags their rules match on.
+    """
+    rules = detect_collection_rules(pd.read_csv(csv_path('page_sku.csv')),
+                                    pd.read_csv(csv_path('sku_master.csv')))
+    existing = load_smart_collections()  # one listing, with each collection's rules
+    pending = set(collections_df['Page Name'])
+    smart_ids = {}
+    for _, row in pd.read_csv(csv_path('page_url.csv')).iterrows():
+        page_name = row['Page Name']
+        current = existing.get(page_name.lower())
+        if page_name not in rules:
+            if current:
+                # Shopify cannot turn it back into a custom collection; its rules still decide
+                print(f"⚠️ {page_name} is a smart collection, but page_sku.csv no longer matches one rule")
+                smart_ids[page_name] = current["id"]
+            continue
+        if current and page_name not in pending and same_rules(current["rules"], rules[page_name]):
+            smart_ids[page_name] = current["id"]
+            continue
+        if not current and find_collection_id_by_title(page_name, include_smart=False):
+            print(f"⚠️ {page_name} already exists as a custom collection; its products are assigned in Step 4")
+            continue
+        try:
+            if current:
+                result = update_smart_collection(current["id"], row, rules[page_name])
+            else:
+                result = create_smart_collection(row, rules[page_name])
+        except Exception as e:
+            print(f"❌ Failed to create smart collection {page_name}: {e}")
+            continue
+        if "smart_collection" not in result:
+            print(f"❌ Failed to create smart collection {page_name}: {result.get('errors')}")
+            continue
+        smart_ids[page_name] = result["smart_collection"]["id"]
+        journal.record("collection", page_name, collection_id=smart_ids[page_name], smart=True)
+        if page_name in pending:
+            manifest.mark('page_url.csv', row)
+        rule = rules[page_name][0]
+        print(f"🤖 {'Updated' if current else 'Created'} Smart Collection: {page_name} "
+              f"({rule['column']} = {rule['condition']})")
+        if rule['column'] == "tag":
+            print(f"ℹ️ Products join {page_name} once they carry the tag; "
+                  f"existing products get it on their next update (--full)")
+    tags = set()
+    for page_name in smart_ids:
+        tags |= rule_tags(rules.get(page_name) or existing.get(page_name.lower(), {}).get("rules", []))
+    return smart_ids, tags
+
+def tag_products(pending, smart_tags):
+    """
+    Step 2 with --smart-collections: add each uploaded row's Subcategory as
+    a tag when a smart collection matches on it. tagsAdd keeps the product's
+    other tags, which a product update would replace.
+    """
+    tagged = 0
+    for _, row in pending.iterrows():
+        tag = subcategory_tag(row)
+        entry = journal.get("product", row['SKU'])
+        if tag in smart_tags and entry and add_product_tags(entry["product_id"], [tag]):
+            tagged += 1
+    if tagged:
+        print(f"🏷️ Tagged {tagged} product(s) for smart collections")
 
 # Step 3: Create Collections
-print("\n🗂️ Creating Collections...")
-for _, row in collections_df.iterrows():
-    try:
-        create_collection(row)
-        print(f"✅ Created Collection: {row['Page Name']}")
-    except Exception as e:
-        print(f"❌ Failed to create collection {row['Page Name']}: {e}")
-
-# Step 4: Assign Products to Collections
-print("\n🔗 Assigning Products to Collections...")
-for _, row in page_sku_df.iterrows():
-    sku = row['SKU']
-    page_name = row['Page Name']
-    product_id = find_product_id_by_sku(sku)
-    collection_id = find_collection_id_by_title(page_name)
-
-    if product_id and collection_id:
+@graph.step("Create Collections", inputs=["collections_df"],
+            outputs=["collections", "smart_collection_ids", "smart_tags"])
+def create_collections(collections_df):
+    print("\n🗂️ Creating Collections...")
+    smart_ids, smart_tags = create_rule_collections(collections_df) if smart_collections else ({}, set())
+    for _, row in collections_df.iterrows():
+        if row['Page Name'] in smart_ids:
+            continue
+        entry = journal.get("collection", row['Page Name'])
+        if entry:
+            if entry.get("smart"):
+                smart_ids[row['Page Name']] = entry["collection_id"]
+            manifest.mark('page_url.csv', row)
+            continue
         try:
-            add_product_to_collection(product_id, collection_id)
-            print(f"✅ Assigned {sku} to {page_name}")
+            if manifest.changed('page_url.csv', row):
+                collection_id = find_collection_id_by_title(row['Page Name'], include_smart=False)
+                result = update_collection(collection_id, row) if collection_id else create_collection(row)
+            else:
+                result = create_collection(row)
+            if "custom_collection" in result:
+                journal.record("collection", row['Page Name'],
+                               collection_id=result["custom_collection"]["id"])
+                manifest.mark('page_url.csv', row)
+            print(f"✅ Created Collection: {row['Page Name']}")
         except Exception as e:
-            print(f"❌ Failed to assign {sku} to {page_name}: {e}")
-    else:
-        print(f"⚠️ Could not find product or collection for SKU {sku}")
-
-# Step 5: Upload Local Product Images
-print("\n🖼️ Uploading Product Images...")
-for _, row in images_df.iterrows():
-    sku = row['SKU']
-    product_id = find_product_id_by_sku(sku)
-    if product_id:
-        position = 1
-        for col in row.index:
-            if col != 'SKU' and pd.notna(row[col]):
-                img_file = row[col]
-                img_path = image_path(img_file)
-                if os.path.exists(img_path):
-                    upload_local_image_to_product(product_id, img_path, position)
-                    print(f"📸 Uploaded {img_file} for {sku} at position {position}")
-                    position += 1
-                else:
-                    print(f"⚠️ Image file not found: {img_path}")
-    else:
-        print(f"⚠️ Product not found for SKU {sku}")
+            print(f"❌ Failed to create collection {row['Page Name']}: {e}")
+    return {"collections": True, "smart_collection_ids": smart_ids, "smart_tags": smart_tags}
+
+def exported_members(collection_id, page_name, product_ids):
+    """
+    A collection's members as of the --bulk-index export, plus the products
+    --upsert joined to it since (journaled as collects); None without an
+    export, so that sync_collection_members() reads them itself.
+    """
+    if catalog_index is None:
+        return None
+    members = set(catalog_index.collection_members.get(legacy_id(collection_id), set()))
+    members |= {product_id for sku, product_id in product_ids.items()
+                if journal.done("collect", f"{sku}|{page_name}")}
+    return members
+
+# Step 4: Assign Products to Collections. Every collection with a new,
+# changed or removed page_sku.csv row is synced as a whole: its members are
+# read once, then added and removed 250 at a time (utils/collection_sync.py).
+# Smart collections are skipped; their rules keep them filled.
+@graph.step("Assign Products to Collections",
+            inputs=["page_sku_df", "removed_rows", "products", "collections", "smart_collection_ids"],
+            outputs=["collects"])
+def assign_products_to_collections(page_sku_df, removed_rows, products, collections, smart_collection_ids):
+    print("\n🔗 Assigning Products to Collections...")
+    smart = page_sku_df['Page Name'].isin(smart_collection_ids)
+    for _, row in page_sku_df[smart].iterrows():
+        manifest.mark('page_sku.csv', row)
+    if smart.any():
+        print(f"🤖 {smart.sum()} row(s) in smart collections; their rules assign the products")
+    page_sku_df = page_sku_df[~smart]
+    journaled = pd.Series([journal.done("collect", f"{sku}|{page_name}")
+                           for sku, page_name in zip(page_sku_df['SKU'], page_sku_df['Page Name'])],
+                          index=page_sku_df.index, dtype=bool)
+    for _, row in page_sku_df[journaled].iterrows():
+        manifest.mark('page_sku.csv', row)
+    pending = page_sku_df[~journaled]
+    touched = set(pending['Page Name'])
+    touched |= {key.split("|")[0] for key in removed_rows.get('page_sku.csv', [])}
+    touched -= set(smart_collection_ids)
+    if not touched:
+        return {"collects": True}
+
+    page_sku = pd.read_csv(csv_path('page_sku.csv'))
+    for page_name in sorted(touched):
+        entry = journal.get("collection", page_name)
+        collection_id = (entry["collection_id"] if entry
+                         else find_collection_id_by_title(page_name, include_smart=False))
+        if not collection_id:
+            print(f"⚠️ Could not find collection {page_name}")
+            continue
+
+        product_ids, unresolved = {}, []
+        for sku in page_sku.loc[page_sku['Page Name'] == page_name, 'SKU']:
+            product_id = product_id_for(sku)
+            if product_id:
+                product_ids[sku] = int(product_id)
+            else:
+                print(f"⚠️ Could not find product for SKU {sku}")
+                unresolved.append(sku)
+        if unresolved:
+            # An unresolved SKU's product may well be a member; it must not look stale
+            print(f"⚠️ {page_name}: {len(unresolved)} SKU(s) unresolved; no products are unassigned this run")
+        try:
+            result = sync_collection_members(collection_id, product_ids.values(), remove_stale=not unresolved,
+                                             current=exported_members(collection_id, page_name, product_ids))
+        except Exception as e:
+            print(f"❌ Failed to sync collection {page_name}: {e}")
+            continue
+        if result is None:
+            continue
+        print(f"✅ {page_name}: {len(result['added'])} assigned, {len(result['removed'])} unassigned, "
+              f"{result['unchanged']} already assigned, {len(result['failed'])} failed")
+
+        failed = set(result['failed'])
+        for _, row in pending[pending['Page Name'] == page_name].iterrows():
+            product_id = product_ids.get(row['SKU'])
+            if product_id and product_id not in failed:
+                journal.record("collect", f"{row['SKU']}|{page_name}")
+                manifest.mark('page_sku.csv', row)
+    return {"collects": True}
+
+# Step 5: Plan Product Images. sku_images.csv and sku_images_alt.csv are
+# joined into one ordered gallery per SKU (utils/image_plan.py).
+@graph.step("Plan Product Images", inputs=["images_df", "images_alt_df"], outputs=["image_plan"])
+def plan_product_images(images_df, images_alt_df):
+    print("\n🗺️ Planning Product Images...")
+    # A SKU edited in either CSV is re-planned from both, so read them whole
+    skus = set(images_df['SKU']) | set(images_alt_df['SKU'])
+    plan = build_image_plan(pd.read_csv(csv_path('sku_images.csv')),
+                            pd.read_csv(csv_path('sku_images_alt.csv')), skus=skus)
+    print(f"🗺️ {sum(len(images) for images in plan.values())} image(s) planned for {len(plan)} SKU(s)")
+    return {"image_plan": plan}
+
+# Step 5b: Optimize Product Images (process pool, cached by source hash + settings)
+@graph.step("Optimize Images", inputs=["image_plan"], outputs=["optimized_images"])
+def optimize_product_images(image_plan):
+    if not optimize:
+        return {"optimized_images": {}}
+    print("\n🗜️ Optimizing Product Images...")
+    paths = [image_path(image.filename) for images in image_plan.values() for image in images]
+    return {"optimized_images": optimize_images(paths, IMAGE_SETTINGS,
+                                                cache_dir=image_path(".optimized"))}
+
+# Step 5c: Reconcile Product Images. Each product's gallery is diffed against
+# the plan and fixed with the fewest create/update/delete/reorder calls.
+@graph.step("Reconcile Product Images",
+            inputs=["image_plan", "images_df", "images_alt_df", "products", "optimized_images"],
+            outputs=["images"])
+def reconcile_images(image_plan, images_df, images_alt_df, products, optimized_images):
+    print("\n🖼️ Reconciling Product Images...")
+    pending = [sku for sku in image_plan if not journal.done("images", sku)]
+    meter = ThroughputMeter("Images", total=len(pending))
+
+    # Files planned for several products are uploaded once and linked by the rest
+    owners = {}
+    for sku in pending:
+        for image in image_plan[sku]:
+            img_path = optimized_images.get(image_path(image.filename), image_path(image.filename))
+            if os.path.isfile(img_path):
+                owners.setdefault(image_registry.file_hash(img_path), set()).add(sku)
+    image_registry.share(digest for digest, skus in owners.items() if len(skus) > 1)
+
+    # One task per SKU keeps each gallery's order; SKUs run side by side
+    def reconcile_sku(sku):
+        product_id = product_id_for(sku)
+        if not product_id:
+            print(f"⚠️ Product not found for SKU {sku}")
+            return None
+        images = []
+        for image in image_plan[sku]:
+            img_path = image_path(image.filename)
+            images.append((optimized_images.get(img_path, img_path), image.alt))
+        counts = reconcile_product_images(product_id, images, image_registry)
+        image_registry.save()  # like the journal, persisted per unit so a killed run keeps its media IDs
+        if counts is None:
+            return None
+        meter.add(images=counts["created"], nbytes=counts["bytes_uploaded"])
+        changes = ", ".join(f"{n} {action}" for action, n in counts.items()
+                            if n and action not in ("unchanged", "bytes_uploaded"))
+        print(f"📸 {sku}: {changes or 'up to date'}")
+        if not counts["failed"]:
+            journal.record("images", sku, **counts)
+            for filename, df in (('sku_images.csv', images_df), ('sku_images_alt.csv', images_alt_df)):
+                for _, row in df[df['SKU'] == sku].iterrows():
+                    manifest.mark(filename, row)
+        return counts
+
+    if pending:
+        load_sku_index()  # once, before the workers look SKUs up in it
+    totals = {}
+    for counts in run_in_pool(pending, reconcile_sku, workers=IMAGE_UPLOAD_WORKERS, label="Images"):
+        for action, n in (counts or {}).items():
+            totals[action] = totals.get(action, 0) + n
+    meter.summary()
+    totals.pop("bytes_uploaded", None)
+    print(f"🏁 Images: {', '.join(f'{n} {action}' for action, n in totals.items()) or 'nothing to do'}")
+    return {"images": True}
 
 # Step 6: Create Pages
-print("\n📄 Creating Pages...")
-for _, row in pages_df.iterrows():
-    try:
-        create_page(row)
-        print(f"✅ Created Page: {row['Title']}")
-    except Exception as e:
-        print(f"❌ Failed to create page {row['Title']}: {e}")
+@graph.step("Create Pages", inputs=["pages_df"], outputs=["pages"])
+def create_pages(pages_df):
+    print("\n📄 Creating Pages...")
+    for _, row in pages_df.iterrows():
+        if journal.done("page", row['Title']):
+            manifest.mark('pages.csv', row)
+            continue
+        try:
+            page_id = None
+            if manifest.changed('pages.csv', row):
+                page_gid = find_page_id_by_title(row['Title'])
+                page_id = page_gid.rsplit("/", 1)[-1] if page_gid else None
+            result = update_page(page_id, row) if page_id else create_page(row)
+            if "page" in result:
+                journal.record("page", row['Title'], page_id=result["page"]["id"])
+                manifest.mark('pages.csv', row)
+            print(f"✅ {'Updated' if page_id else 'Created'} Page: {row['Title']}")
+        except Exception as e:
+            print(f"❌ Failed to create page {row['Title']}: {e}")
+    return {"pages": True}
 
 # Step 7: Update Navigation Menus
-print("\n🧭 Updating Navigation Menus...")
-skipped_links = []
-for _, row in nav_links_df.iterrows():
-    menu_name = row['Menu Name']
-    link_title = row['Link Title']
-    link_type = row['Link Type']
-    target_title = row['Target Title']
-
-    menu_id = find_navigation_menu_id_by_title(menu_name)
-    if menu_id:
-        destination_id = None
-        if link_type == "PAGE":
-            destination_id = find_page_id_by_title(target_title)
-        elif link_type == "COLLECTION":
-            destination_id = find_collection_id_by_title(target_title)
-        elif link_type == "PRODUCT":
-            destination_id = find_product_id_by_title(target_title)
-
-        if destination_id:
-            try:
-                add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id)
-                print(f"✅ Linked '{link_title}' to {menu_name}")
-            except Exception as e:
-                print(f"❌ Failed to link '{link_title}' to {menu_name}: {e}")
+@graph.step("Update Navigation Menus",
+            inputs=["nav_links_df", "pages", "collections", "products"], outputs=["navigation"])
+def update_navigation_menus(nav_links_df, pages, collections, products):
+    print("\n🧭 Updating Navigation Menus...")
+    skipped_links = []
+    for _, row in nav_links_df.iterrows():
+        menu_name = row['Menu Name']
+        link_title = row['Link Title']
+        link_type = row['Link Type']
+        target_title = row['Target Title']
+        if journal.done("menu_link", f"{menu_name}|{link_title}"):
+            manifest.mark('navigation_links.csv', row)
+            continue
+
+        menu_id = find_navigation_menu_id_by_title(menu_name)
+        if menu_id:
+            destination_id = None
+            if link_type == "PAGE":
+                destination_id = find_page_id_by_title(target_title)
+            elif link_type == "COLLECTION":
+                destination_id = find_collection_id_by_title(target_title)
+            elif link_type == "PRODUCT":
+                destination_id = find_product_id_by_title(target_title)
+
+            if destination_id:
+                try:
+                    if manifest.changed('navigation_links.csv', row):
+                        # The link exists from an earlier deploy; a second item would duplicate it
+                        result = replace_link_in_navigation_menu(menu_id, link_title, link_type, destination_id)
+                    else:
+                        result = add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id)
+                    if "errors" not in result:
+                        journal.record("menu_link", f"{menu_name}|{link_title}")
+                        manifest.mark('navigation_links.csv', row)
+                    print(f"✅ Linked '{link_title}' to {menu_name}")
+                except Exception as e:
+                    print(f"❌ Failed to link '{link_title}' to {menu_name}: {e}")
+            else:
+                print(f"⚠️ Could not find {link_type} '{target_title}'")
+                skipped_links.append((menu_name, link_title, target_title))
         else:
-            print(f"⚠️ Could not find {link_type} '{target_title}'")
+            print(f"⚠️ Menu '{menu_name}' not found")
             skipped_links.append((menu_name, link_title, target_title))
-    else:
-        print(f"⚠️ Menu '{menu_name}' not found")
-        skipped_links.append((menu_name, link_title, target_title))
 
-if skipped_links:
-    print("\n🚫 Skipped Navigation Links:")
-    for menu, title, target in skipped_links:
-        print(f" - Menu: {menu}, Link: {title}, Target: {target}")
+    if skipped_links:
+        print("\n🚫 Skipped Navigation Links:")
+        for menu, title, target in skipped_links:
+            print(f" - Menu: {menu}, Link: {title}, Target: {target}")
+    return {"navigation": True}
 
 # Step 8: Upload Theme Template
-print("\n🎨 Uploading Theme Files...")
-theme_file = theme_file_path('page.festival.liquid')
-if os.path.exists(theme_file):
-    try:
-        with open(theme_file, 'r') as f:
-            content = f.read()
-        upload_theme_asset(THEME_ID, 'templates/page.festival.liquid', content)
-        print("✅ Uploaded page.festival.liquid!")
-    except Exception as e:
-        print(f"❌ Theme file upload failed: {e}")
-else:
-    print(f"⚠️ Theme file not found: {theme_file}")
+@graph.step("Upload Theme Template", outputs=["festival_template"])
+def upload_festival_template():
+    print("\n🎨 Uploading Theme Files...")
+    theme_file = theme_file_path('page.festival.liquid')
+    if journal.done("asset", 'templates/page.festival.liquid'):
+        print("📒 page.festival.liquid already journaled")
+    elif os.path.exists(theme_file) and theme_file_unchanged('templates/page.festival.liquid', theme_file):
+        print("➖ page.festival.liquid unchanged")
+    elif os.path.exists(theme_file):
+        try:
+            with open(theme_file, 'r') as f:
+                content = f.read()
+            result = upload_theme_asset(THEME_ID, 'templates/page.festival.liquid', content)
+            if "asset" in result:
+                journal.record("asset", 'templates/page.festival.liquid')
+            print("✅ Uploaded page.festival.liquid!")
+        except Exception as e:
+            print(f"❌ Theme file upload failed: {e}")
+    else:
+        print(f"⚠️ Theme file not found: {theme_file}")
+    return {"festival_template": True}
 
 # Step 9: Create Festival Landing Page
-print("\n🏕️ Creating Festival Landing Page...")
-page_payload = {
-    "page": {
-        "title": "Festival Landing",
-        "handle": "festival-landing",
-        "body_html": "<h1>Festival Outfits Are Here!</h1><p>Shop our latest festival fashion collection and stand out!</p>",
-        "template_suffix": "festival"
+@graph.step("Create Festival Landing Page", inputs=["festival_template"], outputs=["festival_page"])
+def create_festival_page(festival_template):
+    print("\n🏕️ Creating Festival Landing Page...")
+    if journal.done("page", "Festival Landing"):
+        print("📒 Festival Landing Page already journaled")
+        return {"festival_page": True}
+    page_payload = {
+        "page": {
+            "title": "Festival Landing",
+            "handle": "festival-landing",
+            "body_html": "<h1>Festival Outfits Are Here!</h1><p>Shop our latest festival fashion collection and stand out!</p>",
+            "template_suffix": "festival"
+        }
     }
-}
-response = requests.post(f"{SHOPIFY_STORE_URL}/admin/api/{SHOPIFY_API_VERSION}/pages.json",
-                         headers=HEADERS, json=page_payload)
-if response.status_code == 201:
-    page_data = response.json().get('page', {})
-    print(f"✅ Festival Landing Page created at: /pages/{page_data.get('handle')}")
-else:
-    print(f"❌ Festival Page creation failed: {response.status_code}")
-    print(response.json())
-
-# Step 10: Upload Images With ALT Text
-print("\n🖼️ Uploading Images with Structured ALT Text...")
-for _, row in images_alt_df.iterrows():
-    sku = row['SKU']
-    base_alt = row['Base ALT Text']
-    product_id = find_product_id_by_sku(sku)
-
-    if product_id:
-        for i in range(1, 4):
-            img_col = f"Image {i} Filename"
-            if pd.notna(row.get(img_col)):
-                img_file = row[img_col]
-                img_path = image_path(img_file)
-                if os.path.exists(img_path):
-                    upload_local_image_to_product_with_alt(product_id, img_path, i, base_alt)
-                    print(f"✅ Uploaded {img_file} for {sku} with ALT text")
-                else:
-                    print(f"⚠️ Image file not found: {img_path}")
+    response = client.post("pages.json", json=page_payload)
+    if response.status_code == 201:
+        page_data = response.json().get('page', {})
+        journal.record("page", "Festival Landing", page_id=page_data.get('id'))
+        print(f"✅ Festival Landing Page created at: /pages/{page_data.get('handle')}")
     else:
-        print(f"⚠️ Product not found for SKU {sku}")
-
-# Step 11: Inject Aesthetic Enhancements
-print("\n✨ Injecting Aesthetic Enhancements...")
-aesthetic_assets = [
-    "scrolling-banner.css",
-    "loader.css",
-    "aos.css",
-    "aos.js"
-]
+        print(f"❌ Festival Page creation failed: {response.status_code}")
+        print(response.json())
+    return {"festival_page": True}
 
 # Step 12: Upload Scrolling Banner Section
-print("\n🧩 Step 12: Uploading Scrolling Banner Section...")
+@graph.step("Upload Scrolling Banner Section", outputs=["scrolling_banner_section"])
+def upload_scrolling_banner_section():
+    print("\n🧩 Step 12: Uploading Scrolling Banner Section...")
 
-section_file = os.path.join(BASE_DIR, FOLDER, "theme_files", "sections", "scrolling-banner.liquid")
+    section_file = os.path.join(BASE_DIR, FOLDER, "theme_files", "sections", "scrolling-banner.liquid")
 
-if os.path.exists(section_file):
-    try:
-        with open(section_file, "r", encoding="utf-8") as f:
-            section_content = f.read()
-        upload_theme_asset(THEME_ID, "sections/scrolling-banner.liquid", section_content)
-        print("✅ scrolling-banner.liquid uploaded successfully")
-    except Exception as e:
-        print(f"❌ Failed to upload scrolling banner section: {e}")
-else:
-    print(f"⚠️ Section file not found: {section_file}")
+    if journal.done("asset", "sections/scrolling-banner.liquid"):
+        print("📒 scrolling-banner.liquid already journaled")
+    elif os.path.exists(section_file) and theme_file_unchanged("sections/scrolling-banner.liquid", section_file):
+        print("➖ scrolling-banner.liquid unchanged")
+    elif os.path.exists(section_file):
+        try:
+            with open(section_file, "r", encoding="utf-8") as f:
+                section_content = f.read()
+            result = upload_theme_asset(THEME_ID, "sections/scrolling-banner.liquid", section_content)
+            if "asset" in result:
+                journal.record("asset", "sections/scrolling-banner.liquid")
+            print("✅ scrolling-banner.liquid uploaded successfully")
+        except Exception as e:
+            print(f"❌ Failed to upload scrolling banner section: {e}")
+    else:
+        print(f"⚠️ Section file not found: {section_file}")
+    return {"scrolling_banner_section": True}
 
 # Step 13: Upload Hover Image Snippets and Assets
-print("\n🖼️ Step 13: Uploading Hover Image Snippets and Assets...")
-
-csv_path = 'csv/sku_image.csv'
-image_folder = 'images'
-
-try:
-    upload_hover_snippets_from_csv(
-        session=session,
-        THEME_ID=THEME_ID,
-        csv_path=csv_path,
-        image_folder=image_folder
-    )
-    print("✅ Hover image snippets uploaded successfully")
-except Exception as e:
-    print(f"❌ Failed to upload hover snippets: {e}")
-
-# Step 14: Upload Aesthetic Assets (CSS & JS)
-print("\n🎨 Step 14: Uploading Aesthetic Assets...")
-
-aesthetic_assets = [
-    "scrolling-banner.css",
-    "loader.css",
-    "aos.css",
-    "aos.js"
-]
+@graph.step("Upload Hover Image Snippets", outputs=["hover_snippets"])
+def upload_hover_snippets():
+    print("\n🖼️ Step 13: Uploading Hover Image Snippets and Assets...")
 
-for asset in aesthetic_assets:
     try:
-        uploaded = upload_asset(asset)
-        if uploaded:
-            print(f"✅ Uploaded asset: {asset}")
-        else:
-            print(f"⚠️ Failed to upload: {asset}")
+        upload_hover_snippets_from_csv(
+            session=session,
+            THEME_ID=THEME_ID,
+            csv_path='csv/sku_image.csv',
+            image_folder='images'
+        )
+        print("✅ Hover image snippets uploaded successfully")
     except Exception as e:
-        print(f"❌ Error uploading {asset}: {e}")
-
-# Step 15: Inject Asset References
-try:
-    inject_assets_into_theme(aesthetic_assets)
-    print("✅ Asset references injected successfully")
-except Exception as e:
-    print(f"❌ Failed to inject asset references: {e}")
-
-# Optional: Inject Splash Screen
-try:
-    inject_splash_screen()
-    print("✅ Splash screen injected successfully")
-except Exception as e:
-    print(f"❌ Failed to inject splash screen: {e}")
+        print(f"❌ Failed to upload hover snippets: {e}")
+    return {"hover_snippets": True}
+
+# Step 14: Bundle and Upload Aesthetic Assets (CSS & JS)
+@graph.step("Upload Aesthetic Assets", outputs=["aesthetic_assets"])
+def upload_aesthetic_assets():
+    print("\n🎨 Step 14: Bundling and Uploading Aesthetic Assets...")
+
+    asset_folder = os.getenv("ASSET_FOLDER", "assets")
+    bundles = build_bundles(AESTHETIC_ASSETS, asset_folder, name=BUNDLE_NAME)
+    for bundle in bundles:
+        if journal.done("asset", f"assets/{bundle}"):
+            continue
+        bundle_file = os.path.join(asset_folder, bundle)
+        if theme_file_unchanged(f"assets/{bundle}", bundle_file):
+            print(f"➖ Unchanged bundle: {bundle}")
+            continue
+        try:
+            uploaded = upload_asset(bundle)
+            if uploaded:
+                journal.record("asset", f"assets/{bundle}")
+                print(f"✅ Uploaded bundle: {bundle}")
+            else:
+                print(f"⚠️ Failed to upload: {bundle}")
+        except Exception as e:
+            print(f"❌ Error uploading {bundle}: {e}")
+    return {"aesthetic_assets": bundles}
+
+# Step 15: Inject Asset References (and the optional splash screen; both edit theme.liquid)
+@graph.step("Inject Asset References", inputs=["aesthetic_assets"], outputs=["theme_layout"])
+def inject_asset_references(aesthetic_assets):
+    # One listing refreshes the local theme mirror; both injectors then share one read and one upload
+    get_theme_mirror(THEME_ID).pull(["layout/theme.liquid"])
+    transform = ThemeTransform("layout/theme.liquid", THEME_ID)
+    # Tags for earlier bundles, or for the files before they were bundled, are replaced
+    transform.register(add_bundle_tags, aesthetic_assets, name=BUNDLE_NAME, replaces=AESTHETIC_ASSETS)
+    transform.register(add_splash_screen)  # Optional: Inject Splash Screen
+    try:
+        if transform.run():
+            print("✅ Asset references and splash screen injected successfully")
+    except Exception as e:
+        print(f"❌ Failed to update theme.liquid: {e}")
+    return {"theme_layout": True}
 
 # Step 16: Inject Multiple Hover Snippets into Theme File
-print("\n🧩 Step 16: Injecting Multiple Hover Snippets into Theme File...")
+@graph.step("Inject Hover Snippets", inputs=["hover_snippets"], outputs=["hover_snippet_tags"])
+def inject_hover_snippets(hover_snippets):
+    print("\n🧩 Step 16: Injecting Multiple Hover Snippets into Theme File...")
 
-import csv
+    snippet_csv = os.path.join(FOLDER, 'csv', 'sku_images.csv')  # uses FOLDER from .env
+    target_file = "sections/main-product.liquid"  # Update if you want a different target
 
-csv_path = os.path.join(FOLDER, 'csv', 'sku_images.csv')  # uses FOLDER from .env
-theme_file_path = "sections/main-product.liquid"  # Update if you want a different target
-
-# Count number of hover snippets based on CSV rows
-try:
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        num_snippets = sum(1 for _ in csv.DictReader(file))
-    print(f"🔢 Found {num_snippets} hover snippet(s) in {csv_path}")
-except Exception as e:
-    print(f"❌ Failed to read CSV for snippet count: {e}")
-    num_snippets = 0
-
-# Inject all render tags into the theme file
-if num_snippets > 0:
+    # Count number of hover snippets based on CSV rows
     try:
-        insert_multiple_snippets_into_theme_file(
-            session=session,
-            theme_id=THEME_ID,
-            theme_file_path=theme_file_path,
-            num_snippets=num_snippets,
-            insert_before=None  # Optional: anchor string if you want to inject before a known block
-        )
+        with open(snippet_csv, 'r', encoding='utf-8') as file:
+            num_snippets = sum(1 for _ in csv.DictReader(file))
+        print(f"🔢 Found {num_snippets} hover snippet(s) in {snippet_csv}")
     except Exception as e:
-        print(f"❌ Failed to inject snippet tags: {e}")
-else:
-    print("⚠️ Skipping snippet injection due to missing or empty CSV.")
+        print(f"❌ Failed to read CSV for snippet count: {e}")
+        num_snippets = 0
+
+    # Inject all render tags into the theme file
+    if num_snippets > 0:
+        try:
+            insert_multiple_snippets_into_theme_file(
+                session=session,
+                theme_id=THEME_ID,
+                theme_file_path=target_file,
+                num_snippets=num_snippets,
+                insert_before=None  # Optional: anchor string if you want to inject before a known block
+            )
+        except Exception as e:
+            print(f"❌ Failed to inject snippet tags: {e}")
+    else:
+        print("⚠️ Skipping snippet injection due to missing or empty CSV.")
+    return {"hover_snippet_tags": True}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deploy the FOLDER store data to Shopify.")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip work recorded in the checkpoint journal by an earlier run")
+    parser.add_argument("--full", action="store_true",
+                        help="send every CSV row, not only rows changed since the last deploy")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="upload product images exactly as they are on disk")
+    parser.add_argument("--image-workers", type=int, default=IMAGE_UPLOAD_WORKERS,
+                        help="products whose images upload concurrently")
+    parser.add_argument("--bulk-import", action="store_true",
+                        help="create new products with one bulk operation instead of one call each")
+    parser.add_argument("--upsert", action="store_true",
+                        help="create each product with its SEO, collections and images in one mutation")
+    parser.add_argument("--smart-collections", action="store_true",
+                        help="create collections that follow one Category, Brand or Subcategory as smart collections")
+    parser.add_argument("--bulk-index", action="store_true",
+                        help="index the existing catalog with one bulk export instead of paged reads")
+    args = parser.parse_args()
+
+    optimize = not args.no_optimize
+    bulk_import = args.bulk_import
+    upsert = args.upsert
+    smart_collections = args.smart_collections
+    IMAGE_UPLOAD_WORKERS = args.image_workers
+
+    journal = DeployJournal(JOURNAL_PATH, resume=args.resume)
+    manifest = CsvManifest(MANIFEST_PATH, full=args.full)
+    image_registry = ImageRegistry(IMAGE_REGISTRY_PATH)
+    if args.bulk_index:
+        catalog_index = load_catalog_index()
+    try:
+        graph.run(max_workers=MAX_PARALLEL_STEPS)
+    finally:
+        image_registry.save()
+        manifest.save()
+        journal.close()
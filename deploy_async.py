@@ -0,0 +1,185 @@
+# deploy_async.py
+# Async counterpart of the catalog steps of deploy.py (products, collections,
+# collects, images, pages, navigation). Rows inside a step run concurrently,
+# bounded per step by STEP_CONCURRENCY; every request shares one rate limiter.
+# Theme steps stay in deploy.py.
+
+# Load Libraries
+import asyncio
+import os
+import pandas as pd
+from dotenv import load_dotenv
+
+from utils.async_shopify_api import (
+    AsyncShopifyClient,
+    create_product,
+    create_collection,
+    add_product_to_collection,
+    upload_local_image_to_product,
+    create_page,
+    add_link_to_navigation_menu,
+    run_step,
+)
+from utils.shopify_api import (
+    load_sku_index,
+    sku_index_complete,
+    find_product_id_by_sku,
+    paginate_rest,
+    find_navigation_menu_id_by_title,
+    find_page_id_by_title,
+    find_product_id_by_title,
+)
+from utils.image_plan import build_image_plan
+from utils.shopify_client import get_default_client
+
+# Step 0: Load environment variables
+load_dotenv()
+FOLDER = os.getenv('FOLDER')
+
+# Maximum in-flight rows per step
+STEP_CONCURRENCY = {
+    "products": 8,
+    "collections": 4,
+    "collects": 8,
+    "images": 4,
+    "pages": 4,
+    "navigation": 2,
+}
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+def csv_path(filename): return os.path.join(BASE_DIR, FOLDER, "csv", filename)
+def image_path(filename): return os.path.join(BASE_DIR, FOLDER, "images", filename)
+
+
+def rows(df):
+    return [row for _, row in df.iterrows()]
+
+
+def collection_ids_by_title():
+    """Title (lower-case) -> custom collection ID, read once in a single paginated pass."""
+    return {
+        c['title'].lower(): c['id']
+        for c in paginate_rest("custom_collections.json", "custom_collections",
+                               params={"fields": "id,title"})
+    }
+
+
+async def main():
+    # The sync client is used for the one-off paginated lookups; sharing its
+    # buckets keeps both clients under the same store limits.
+    sync_client = get_default_client()
+
+    # Step 1: Load CSVs
+    print("\n📂 Loading CSV files...")
+    products_df = pd.read_csv(csv_path('sku_master.csv'))
+    collections_df = pd.read_csv(csv_path('page_url.csv'))
+    page_sku_df = pd.read_csv(csv_path('page_sku.csv'))
+    images_df = pd.read_csv(csv_path('sku_images.csv'))
+    pages_df = pd.read_csv(csv_path('pages.csv'))
+    nav_links_df = pd.read_csv(csv_path('navigation_links.csv'))
+    images_alt_df = pd.read_csv(csv_path('sku_images_alt.csv'))
+
+    async with AsyncShopifyClient(rate_limiter=sync_client.rate_limiter,
+                                  cost_throttle=sync_client.cost_throttle) as client:
+
+        # Step 2: Upload Products
+        print("\n📦 Uploading Products...")
+        await asyncio.to_thread(load_sku_index)
+
+        async def upload_product(row):
+            await create_product(client, row)
+            print(f"✅ Uploaded Product: {row['Product Name']}")
+
+        if sku_index_complete():
+            await run_step("Products", rows(products_df), upload_product, STEP_CONCURRENCY["products"])
+        else:
+            # SKUs on the unread pages would look new and be created a second time
+            print("❌ The SKU index is incomplete; not creating products")
+
+        # Step 3: Create Collections
+        print("\n🗂️ Creating Collections...")
+
+        async def make_collection(row):
+            await create_collection(client, row)
+            print(f"✅ Created Collection: {row['Page Name']}")
+
+        await run_step("Collections", rows(collections_df), make_collection,
+                       STEP_CONCURRENCY["collections"])
+
+        # Step 4: Assign Products to Collections
+        print("\n🔗 Assigning Products to Collections...")
+        collection_ids = await asyncio.to_thread(collection_ids_by_title)
+
+        async def assign(row):
+            product_id = find_product_id_by_sku(row['SKU'])
+            collection_id = collection_ids.get(row['Page Name'].lower())
+            if product_id and collection_id:
+                await add_product_to_collection(client, product_id, collection_id)
+                print(f"✅ Assigned {row['SKU']} to {row['Page Name']}")
+            else:
+                print(f"⚠️ Could not find product or collection for SKU {row['SKU']}")
+
+        await run_step("Collects", rows(page_sku_df), assign, STEP_CONCURRENCY["collects"])
+
+        # Steps 5 and 10: Upload Product Images. Both image CSVs are joined
+        # into one gallery per SKU (utils/image_plan.py), so a file listed in
+        # both goes up once. One task per SKU keeps each product's positions
+        # in order; different SKUs upload in parallel.
+        async def upload_images(job):
+            sku, planned = job
+            product_id = find_product_id_by_sku(sku)
+            if not product_id:
+                print(f"⚠️ Product not found for SKU {sku}")
+                return
+            position = 1
+            for image in planned:
+                img_path = image_path(image.filename)
+                if os.path.exists(img_path):
+                    await upload_local_image_to_product(client, product_id, img_path, position, image.alt)
+                    position += 1
+                else:
+                    print(f"⚠️ Image file not found: {img_path}")
+
+        print("\n🖼️ Uploading Product Images...")
+        jobs = list(build_image_plan(images_df, images_alt_df).items())
+        await run_step("Images", jobs, upload_images, STEP_CONCURRENCY["images"])
+
+        # Step 6: Create Pages
+        print("\n📄 Creating Pages...")
+
+        async def make_page(row):
+            await create_page(client, row)
+            print(f"✅ Created Page: {row['Title']}")
+
+        await run_step("Pages", rows(pages_df), make_page, STEP_CONCURRENCY["pages"])
+
+        # Step 7: Update Navigation Menus. Links are added in CSV order within
+        # a menu; separate menus are filled in parallel.
+        print("\n🧭 Updating Navigation Menus...")
+        finders = {
+            "PAGE": find_page_id_by_title,
+            "COLLECTION": lambda title: collection_ids.get(title.lower()),
+            "PRODUCT": find_product_id_by_title,
+        }
+
+        async def fill_menu(menu):
+            menu_name, links = menu
+            menu_id = await asyncio.to_thread(find_navigation_menu_id_by_title, menu_name)
+            if not menu_id:
+                print(f"⚠️ Menu '{menu_name}' not found")
+                return
+            for _, row in links.iterrows():
+                finder = finders.get(str(row['Link Type']).upper())
+                destination_id = await asyncio.to_thread(finder, row['Target Title']) if finder else None
+                if destination_id:
+                    await add_link_to_navigation_menu(client, menu_id, row['Link Title'],
+                                                      row['Link Type'], destination_id)
+                else:
+                    print(f"⚠️ Could not find {row['Link Type']} '{row['Target Title']}'")
+
+        await run_step("Navigation", list(nav_links_df.groupby('Menu Name', sort=False)),
+                       fill_menu, STEP_CONCURRENCY["navigation"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
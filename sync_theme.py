@@ -0,0 +1,30 @@
+# sync_theme.py
+# Checksum-based alternative to `push_theme.sh`: lists the theme's assets
+# once, compares their checksums with the local files and uploads only new
+# or changed ones. Repeat pushes of an unchanged theme cost one API call.
+#
+#   python sync_theme.py                  # push $FOLDER to $THEME_ID
+#   python sync_theme.py --dry-run        # show what would change
+#   python sync_theme.py --delete         # also delete files removed locally
+
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+
+from utils.theme_sync import sync_theme
+
+# Load environment variables from .env
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload only new or changed theme files.")
+    parser.add_argument("--path", default=os.getenv("FOLDER"),
+                        help="theme directory holding assets/, layout/, sections/, ... (default: $FOLDER)")
+    parser.add_argument("--theme", default=os.getenv("THEME_ID"), help="theme ID (default: $THEME_ID)")
+    parser.add_argument("--delete", action="store_true", help="delete remote files missing locally")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without uploading")
+    args = parser.parse_args()
+
+    ok = sync_theme(args.path, args.theme, delete=args.delete, dry_run=args.dry_run)
+    sys.exit(0 if ok else 1)
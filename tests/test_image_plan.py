@@ -0,0 +1,30 @@
+from itertools import permutations
+
+from utils.image_plan import reorder_moves
+
+
+def apply_moves(order, moves):
+    """Apply productReorderMedia moves the way Shopify does: one after another."""
+    order = list(order)
+    for move in moves:
+        order.remove(move["id"])
+        order.insert(int(move["newPosition"]), move["id"])
+    return order
+
+
+def test_reorder_moves_example():
+    actual, wanted = ["A", "B", "C", "D"], ["C", "B", "D", "A"]
+    assert apply_moves(actual, reorder_moves(actual, wanted)) == wanted
+
+
+def test_reorder_moves_every_permutation():
+    for size in range(1, 7):
+        actual = [f"M{i}" for i in range(size)]
+        for wanted in permutations(actual):
+            moves = reorder_moves(actual, list(wanted))
+            assert apply_moves(actual, moves) == list(wanted)
+            assert len(moves) <= size - 1  # the last item is in place once the rest are
+
+
+def test_reorder_moves_in_order():
+    assert reorder_moves(["A", "B"], ["A", "B"]) == []
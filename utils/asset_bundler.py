@@ -0,0 +1,127 @@
+import glob
+import hashlib
+import os
+import re
+
+from utils.shopify_api import add_asset_tags, asset_tag_block
+
+# Storefront CSS/JS is concatenated and minified into one bundle per type,
+# named <name>.<content hash>.min.css / .min.js. A changed source gives a
+# new file name, so browsers never serve a stale cached copy, and an
+# unchanged one keeps its name, so nothing is re-uploaded.
+
+HASH_LENGTH = 10
+
+
+# Comments, then the parts of a stylesheet that must reach the browser
+# byte for byte: quoted strings and url(...) values
+CSS_TOKENS = re.compile(r"""(/\*.*?\*/)|("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\))""",
+                        flags=re.S | re.I)
+
+
+def minify_css(text):
+    """Strip comments and needless whitespace from a stylesheet, leaving strings and url() values as written."""
+    kept = []
+
+    def hold(match):
+        if match.group(1):
+            return ""  # comment
+        kept.append(match.group(2))
+        return f"\0{len(kept) - 1}\0"
+
+    text = CSS_TOKENS.sub(hold, text)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)  # not before ":", where a space means a descendant selector
+    text = text.replace(";}", "}")
+    text = re.sub(r"\0(\d+)\0", lambda match: kept[int(match.group(1))], text)
+    return text.strip()
+
+
+def minify_js(text):
+    """
+    Conservative script minification: drops blank lines, whole-line //
+    comments and indentation. Anything inside a line is left alone, so
+    strings and regex literals cannot be broken.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+SEPARATORS = {".css": "\n", ".js": ";\n"}  # ";" guards against a file without a trailing semicolon
+
+
+def bundle_name(name, ext, content):
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    return f"{name}.{digest}.min{ext}"
+
+
+def build_bundles(filenames, asset_folder, name="bundle"):
+    """
+    Concatenate and minify the CSS and JS files into hashed bundles.
+
+    Bundles are written next to their sources (in `asset_folder`) so they
+    upload like any other asset; older bundles of the same name are removed.
+
+    Args:
+        filenames (list): Asset file names, in load order.
+        asset_folder (str): Folder holding the files; bundles are written here.
+        name (str): Bundle base name.
+
+    Returns:
+        list: Bundle file names (CSS first, then JS); files of other types
+        and missing files are skipped with a warning.
+    """
+    sources = {ext: [] for ext in MINIFIERS}
+    for filename in filenames:
+        ext = os.path.splitext(filename)[1].lower()
+        path = os.path.join(asset_folder, filename)
+        if ext not in sources:
+            print(f"⚠️ Not bundled (unsupported type): {filename}")
+        elif not os.path.isfile(path):
+            print(f"⚠️ Not bundled (file not found): {path}")
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                sources[ext].append(MINIFIERS[ext](f.read()))
+
+    bundles = []
+    for ext, parts in sources.items():
+        if not parts:
+            continue
+        content = SEPARATORS[ext].join(parts) + "\n"
+        filename = bundle_name(name, ext, content)
+        path = os.path.join(asset_folder, filename)
+        for old in glob.glob(os.path.join(asset_folder, f"{glob.escape(name)}.*.min{ext}")):
+            if os.path.basename(old) != filename:
+                os.remove(old)
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        size = sum(os.path.getsize(os.path.join(asset_folder, fn)) for fn in filenames
+                   if fn.lower().endswith(ext) and os.path.isfile(os.path.join(asset_folder, fn)))
+        print(f"📦 {filename}: {len(parts)} file(s), {size} -> {len(content.encode('utf-8'))} bytes")
+        bundles.append(filename)
+    return bundles
+
+
+def add_bundle_tags(content, bundles, name="bundle", replaces=()):
+    """
+    Point theme.liquid at the current bundles.
+
+    Tag lines for earlier bundles of the same name, or for the individual
+    files listed in `replaces`, are removed before the new tags are added.
+    """
+    stale = re.compile(r'"/assets/(?:' + re.escape(name) + r'\.[0-9a-f]+\.min\.(?:css|js)'
+                       + "".join("|" + re.escape(f) for f in replaces) + r')"')
+    if asset_tag_block(bundles) in content:
+        return content  # already pointing at exactly these bundles
+    lines = content.split("\n")
+    kept = [line for line in lines if not (stale.search(line) and "asset_url" in line)]
+    if len(kept) != len(lines):
+        print(f"🧹 Removed {len(lines) - len(kept)} outdated asset tag(s)")
+    return add_asset_tags("\n".join(kept), bundles)
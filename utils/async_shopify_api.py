@@ -0,0 +1,249 @@
+import asyncio
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+from utils.rate_limit import (
+    GraphQLCostThrottle,
+    RestRateLimiter,
+    backoff_delay,
+    is_throttled,
+    retry_after_seconds,
+)
+from utils.shopify_api import (
+    MENU_ITEM_CREATE_MUTATION,
+    collect_payload,
+    collection_payload,
+    find_product_id_by_sku,
+    image_view_name,
+    menu_item_input,
+    page_payload,
+    product_payload,
+    register_sku,
+)
+from utils.shopify_client import (DEFAULT_MAX_RETRIES, DEFAULT_POOL_SIZE, IDEMPOTENT_METHODS, RETRY_STATUSES,
+                                  is_mutation)
+from utils.streaming_body import Base64JsonBody, product_image_body
+
+# Load environment variables
+load_dotenv()
+
+# Async counterparts of the row-level helpers in utils/shopify_api.py. They
+# build the same payloads and share the same rate limiter types, so a sync
+# ShopifyClient and an AsyncShopifyClient can pace against one bucket.
+
+
+class AsyncShopifyClient:
+    """
+    httpx.AsyncClient wrapper for the Shopify Admin API.
+
+    Mirrors ShopifyClient: keep-alive pool, base URL and API version,
+    REST pacing through a RestRateLimiter, GraphQL pacing through a
+    GraphQLCostThrottle, and jittered retries for 429/5xx/THROTTLED.
+    Use as `async with AsyncShopifyClient(...) as client:`.
+
+    Args:
+        store_url (str): Store base URL, e.g. "https://my-store.myshopify.com".
+        access_token (str): Admin API access token.
+        api_version (str): Admin API version, e.g. "2023-10".
+        pool_size (int): Maximum number of open connections to the store.
+        timeout (float): Default timeout per request, in seconds.
+        rate_limiter (RestRateLimiter): REST bucket model; share one across clients.
+        cost_throttle (GraphQLCostThrottle): GraphQL cost bucket model.
+        max_retries (int): Retries for 429/5xx, THROTTLED and connection errors.
+    """
+
+    def __init__(self, store_url=None, access_token=None, api_version=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=60.0,
+                 rate_limiter=None, cost_throttle=None, max_retries=DEFAULT_MAX_RETRIES):
+        self.store_url = (store_url or os.getenv("SHOPIFY_STORE_URL") or "").rstrip("/")
+        self.api_version = api_version or os.getenv("SHOPIFY_API_VERSION", "2023-10")
+        self.rate_limiter = rate_limiter or RestRateLimiter()
+        self.cost_throttle = cost_throttle or GraphQLCostThrottle()
+        self.max_retries = max_retries
+        self.http = httpx.AsyncClient(
+            base_url=f"{self.store_url}/admin/api/{self.api_version}/",
+            headers={
+                "Content-Type": "application/json",
+                "X-Shopify-Access-Token": access_token or os.getenv("SHOPIFY_ACCESS_TOKEN"),
+            },
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=timeout,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a request, paced and retried like ShopifyClient.request().
+
+        `content` may be a Base64JsonBody; it is streamed afresh on every attempt.
+        """
+        is_rest = not path.endswith("graphql.json")
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        body = kwargs.get("content")
+        if isinstance(body, Base64JsonBody):
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"Content-Length": str(len(body))})
+
+        for attempt in range(self.max_retries + 1):
+            if isinstance(body, Base64JsonBody):
+                kwargs["content"] = body.aiter_bytes()
+            if is_rest:
+                await self.rate_limiter.acquire_async()
+            try:
+                response = await self.http.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                # ConnectError/ConnectTimeout: nothing was sent, so even a POST is safe to resend
+                connect_failed = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt == self.max_retries or not (idempotent or connect_failed):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            if is_rest:
+                self.rate_limiter.update(response)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            if response.status_code != 429 and not idempotent:
+                return response  # may already have been applied
+
+            if response.status_code == 429:
+                delay = retry_after_seconds(response, default=backoff_delay(attempt))
+                if is_rest:
+                    self.rate_limiter.penalize()
+            else:
+                delay = backoff_delay(attempt)
+            print(f"⏳ {method} {path} returned {response.status_code}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request("PUT", path, **kwargs)
+
+    async def graphql(self, query, variables=None):
+        """Run a GraphQL query, paced by query cost and retried when THROTTLED."""
+        payload = {"query": query, "variables": variables or {}}
+        for attempt in range(self.max_retries + 1):
+            await self.cost_throttle.wait_for_async(query)
+            response = await self.post("graphql.json", json=payload, idempotent=not is_mutation(query))
+            response.raise_for_status()
+            body = response.json()
+            self.cost_throttle.update(query, body)
+            if not is_throttled(body) or attempt == self.max_retries:
+                return body
+
+            delay = self.cost_throttle.throttled_delay(query) + backoff_delay(0)
+            print(f"⏳ GraphQL query throttled; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+# ------------------ PRODUCT & COLLECTION ------------------
+
+async def create_product(client, product_data):
+    """Create a new product if SKU doesn't exist (SKU check uses the cached index)."""
+    existing_product_id = find_product_id_by_sku(product_data["SKU"])
+    if existing_product_id:
+        print(f"Product with SKU {product_data['SKU']} exists. Skipping.")
+        return {"status": "exists", "product_id": existing_product_id}
+
+    response = await client.post("products.json", json=product_payload(product_data))
+    result = response.json()
+    product = result.get("product")
+    if product:
+        for variant in product.get("variants", []):
+            register_sku(variant.get("sku"), product["id"], variant.get("id"))
+    return result
+
+async def create_collection(client, collection_data):
+    """Create a custom collection."""
+    response = await client.post("custom_collections.json", json=collection_payload(collection_data))
+    return response.json()
+
+async def add_product_to_collection(client, product_id, collection_id):
+    """Add product to collection."""
+    response = await client.post("collects.json", json=collect_payload(product_id, collection_id))
+    return response.json()
+
+# ------------------ IMAGE MANAGEMENT ------------------
+
+async def upload_local_image_to_product(client, product_id, image_path, position, alt=None):
+    """
+    Upload a local image; ALT text defaults to the positional view name.
+
+    The base64 body is streamed from disk as it is sent, so memory use
+    stays flat whatever the file size and concurrency.
+    """
+    if not os.path.isfile(image_path):
+        print(f"❌ File not found: {image_path}")
+        return
+
+    alt_text = alt or image_view_name(position)
+    body = product_image_body(image_path, position, alt_text)
+    response = await client.post(f"products/{product_id}/images.json", content=body)
+    print(f"Uploaded {image_path} (Position {position}, ALT: {alt_text})")
+    return response.json()
+
+# ------------------ PAGES & MENUS ------------------
+
+async def create_page(client, page_data):
+    """Create a Shopify page."""
+    response = await client.post("pages.json", json=page_payload(page_data))
+    return response.json()
+
+async def graphql_query(client, query, variables=None):
+    """Send a GraphQL query, returning an {"errors": [...]} body on transport failure."""
+    try:
+        return await client.graphql(query, variables)
+    except httpx.HTTPError as e:
+        print(f"❌ GraphQL error: {e}")
+        return {"errors": [{"message": str(e)}]}
+
+async def add_link_to_navigation_menu(client, menu_id, link_title, link_type, destination_id=None):
+    """Add a link to a menu."""
+    variables = {"menuItem": menu_item_input(menu_id, link_title, link_type, destination_id)}
+    result = await graphql_query(client, MENU_ITEM_CREATE_MUTATION, variables)
+
+    if "errors" in result:
+        print(f"❌ Error adding link: {result['errors']}")
+    else:
+        print(f"✅ Added link: {link_title}")
+
+    return result
+
+# ------------------ STEP RUNNER ------------------
+
+async def run_step(name, items, worker, concurrency):
+    """
+    Run `worker(item)` for every item with at most `concurrency` in flight.
+
+    A failing item is reported and counted; it does not cancel the rest of
+    the step. Returns (succeeded, failed) counts.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def run_one(item):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await worker(item)
+            except Exception as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+
+    await asyncio.gather(*(run_one(item) for item in items))
+    print(f"🏁 {name}: {len(items) - failed} ok, {failed} failed")
+    return len(items) - failed, failed
@@ -0,0 +1,361 @@
+import json
+import os
+import time
+
+from utils.shopify_api import graphql_query, install_catalog_index, product_input, register_sku
+from utils.shopify_client import DEFAULT_TIMEOUT
+from utils.staged_uploads import STAGED_UPLOADS_CREATE_MUTATION, staging_session
+
+# GraphQL bulk operations: Shopify runs a whole export (or one mutation per
+# line of a staged JSONL file) as one background job and publishes the
+# result as a JSONL file, one object per line; nested connection items get
+# their own lines pointing back through `__parentId`. Result files are
+# streamed line by line, so memory stays flat however large the catalog is.
+
+BULK_OPERATION_RUN_QUERY_MUTATION = """
+mutation bulkOperationRunQuery($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_OPERATION_STATUS_QUERY = """
+query bulkOperationStatus($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation {
+      id
+      status
+      errorCode
+      objectCount
+      url
+      partialDataUrl
+    }
+  }
+}
+"""
+
+BULK_OPERATION_RUN_MUTATION_MUTATION = """
+mutation bulkOperationRunMutation($mutation: String!, $stagedUploadPath: String!) {
+  bulkOperationRunMutation(mutation: $mutation, stagedUploadPath: $stagedUploadPath) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+FINISHED_STATUSES = {"COMPLETED", "FAILED", "CANCELED", "EXPIRED"}
+
+# Every product with its variants' SKUs and the collections it belongs to
+CATALOG_EXPORT_QUERY = """
+{
+  products {
+    edges {
+      node {
+        id
+        title
+        variants { edges { node { id sku } } }
+        collections { edges { node { id title ruleSet { appliedDisjunctively } } } }
+      }
+    }
+  }
+}
+"""
+
+
+def legacy_id(gid):
+    """Numeric REST ID from a GraphQL ID ("gid://shopify/Product/123" -> 123)."""
+    return int(str(gid).rsplit("/", 1)[-1])
+
+
+def wait_for_bulk_operation(operation_id, poll_interval=2.0, timeout=3600, client=None):
+    """
+    Poll a bulk operation until it finishes.
+
+    Returns:
+        dict: The final BulkOperation (status, errorCode, objectCount, url),
+        or None if polling failed or timed out.
+    """
+    deadline = time.monotonic() + timeout
+    last_count = None
+    while time.monotonic() < deadline:
+        result = graphql_query(BULK_OPERATION_STATUS_QUERY, {"id": operation_id}, client=client)
+        if "errors" in result or not result.get("data", {}).get("node"):
+            print(f"❌ Could not poll bulk operation {operation_id}: {result.get('errors')}")
+            return None
+        operation = result["data"]["node"]
+        if operation["status"] in FINISHED_STATUSES:
+            return operation
+        if operation.get("objectCount") != last_count:
+            last_count = operation.get("objectCount")
+            print(f"⏳ Bulk operation {operation['status'].lower()}: {last_count} object(s) so far")
+        time.sleep(poll_interval)
+    print(f"❌ Bulk operation {operation_id} did not finish within {timeout}s")
+    return None
+
+
+def _start_bulk_operation(mutation, name, variables, client=None):
+    """Run a bulkOperationRun* mutation; returns the new operation's ID or None."""
+    result = graphql_query(mutation, variables, client=client)
+    if "errors" in result:
+        print(f"❌ {name} failed: {result['errors']}")
+        return None
+    payload = result["data"][name]
+    if payload["userErrors"]:
+        # e.g. another bulk operation of the same type is still running
+        print(f"❌ {name} failed: {payload['userErrors']}")
+        return None
+    return payload["bulkOperation"]["id"]
+
+
+def _finish_bulk_operation(operation_id, poll_interval, timeout, client=None, partial=False):
+    """
+    Wait for a started operation. With `partial`, an operation that stopped
+    early is returned too when it left a partialDataUrl (the work it did
+    before failing), so the caller can account for it.
+    """
+    if operation_id is None:
+        return None
+    operation = wait_for_bulk_operation(operation_id, poll_interval, timeout, client=client)
+    if operation is None:
+        return None
+    if operation["status"] != "COMPLETED":
+        print(f"❌ Bulk operation {operation['status'].lower()}: {operation.get('errorCode')}")
+        if partial and operation.get("partialDataUrl"):
+            print("↩️ Reading the partial results it left")
+            return operation
+        return None
+    print(f"✅ Bulk operation completed: {operation.get('objectCount')} object(s)")
+    return operation
+
+
+def run_bulk_query(query, poll_interval=2.0, timeout=3600, client=None):
+    """
+    Submit a bulkOperationRunQuery job and wait for it.
+
+    Returns:
+        dict: The finished BulkOperation; `url` is None when the query
+        matched nothing. None if the job could not be started or failed.
+    """
+    operation_id = _start_bulk_operation(BULK_OPERATION_RUN_QUERY_MUTATION, "bulkOperationRunQuery",
+                                         {"query": query}, client=client)
+    return _finish_bulk_operation(operation_id, poll_interval, timeout, client=client)
+
+
+def stage_jsonl(path, client=None):
+    """
+    Upload a JSONL variables file for bulkOperationRunMutation.
+
+    Returns:
+        str: The stagedUploadPath to run the mutation with, or None on failure.
+    """
+    upload_input = [{
+        "filename": os.path.basename(path),
+        "mimeType": "text/jsonl",
+        "resource": "BULK_MUTATION_VARIABLES",
+        "httpMethod": "POST",
+    }]
+    result = graphql_query(STAGED_UPLOADS_CREATE_MUTATION, {"input": upload_input}, client=client)
+    if "errors" in result:
+        print(f"❌ stagedUploadsCreate failed: {result['errors']}")
+        return None
+    payload = result["data"]["stagedUploadsCreate"]
+    if payload["userErrors"]:
+        print(f"❌ stagedUploadsCreate failed: {payload['userErrors']}")
+        return None
+    target = payload["stagedTargets"][0]
+    fields = {param["name"]: param["value"] for param in target["parameters"]}
+    with open(path, "rb") as f:
+        response = staging_session().post(target["url"], data=fields,
+                                          files={"file": (os.path.basename(path), f, "text/jsonl")},
+                                          timeout=DEFAULT_TIMEOUT)
+    if response.status_code not in (200, 201, 204):
+        print(f"❌ Staged upload failed for {path}: {response.status_code}")
+        return None
+    return fields["key"]
+
+
+def run_bulk_mutation(mutation, jsonl_path, poll_interval=2.0, timeout=3600, client=None):
+    """
+    Stage a JSONL variables file and run `mutation` once per line as one bulk job.
+
+    Returns:
+        dict: The finished BulkOperation: `url` holds the results, or, for a
+        job that failed partway, `partialDataUrl` holds the lines it ran.
+        None if staging or polling failed or the job left no results.
+    """
+    staged_path = stage_jsonl(jsonl_path, client=client)
+    if staged_path is None:
+        return None
+    operation_id = _start_bulk_operation(BULK_OPERATION_RUN_MUTATION_MUTATION, "bulkOperationRunMutation",
+                                         {"mutation": mutation, "stagedUploadPath": staged_path},
+                                         client=client)
+    # Mutations that ran before a failure took effect; their results must not be lost
+    return _finish_bulk_operation(operation_id, poll_interval, timeout, client=client, partial=True)
+
+
+def stream_jsonl(url):
+    """Yield the objects of a bulk operation result file one line at a time."""
+    if not url:
+        return
+    # Signed storage URL: fetched without the store's access token
+    with staging_session().get(url, stream=True, timeout=DEFAULT_TIMEOUT) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+class CatalogIndex:
+    """
+    Lookup maps built from one catalog export.
+
+    Attributes:
+        skus (dict): SKU -> REST product ID.
+        variant_ids (dict): SKU -> REST variant ID.
+        product_titles (dict): Lower-cased title -> product GraphQL ID.
+        collection_titles (dict): Lower-cased title -> REST ID of a custom collection.
+        smart_collection_titles (dict): The same for smart (rule-based) collections.
+        collection_members (dict): REST collection ID -> set of REST product IDs.
+    """
+
+    def __init__(self):
+        self.skus = {}
+        self.variant_ids = {}
+        self.product_titles = {}
+        self.collection_titles = {}
+        self.smart_collection_titles = {}
+        self.collection_members = {}
+
+    def add(self, record):
+        """Fold one JSONL line of CATALOG_EXPORT_QUERY into the maps."""
+        gid = record["id"]
+        kind = gid.split("/")[3]
+        if kind == "Product":
+            self.product_titles[record["title"].lower()] = gid
+        elif kind == "ProductVariant" and record.get("sku"):
+            self.skus[record["sku"]] = legacy_id(record["__parentId"])
+            self.variant_ids[record["sku"]] = legacy_id(gid)
+        elif kind == "Collection":
+            collection_id = legacy_id(gid)
+            # Only smart collections have a rule set; products cannot be added to them by hand
+            titles = self.smart_collection_titles if record.get("ruleSet") else self.collection_titles
+            titles.setdefault(record["title"].lower(), collection_id)
+            self.collection_members.setdefault(collection_id, set()).add(legacy_id(record["__parentId"]))
+
+
+def export_catalog(poll_interval=2.0, timeout=3600, client=None):
+    """
+    Index the whole catalog with one bulk export.
+
+    Returns:
+        CatalogIndex: The maps, or None if the export failed.
+    """
+    operation = run_bulk_query(CATALOG_EXPORT_QUERY, poll_interval, timeout, client=client)
+    if operation is None:
+        return None
+    index = CatalogIndex()
+    for record in stream_jsonl(operation.get("url")):
+        index.add(record)
+    return index
+
+
+def load_catalog_index(poll_interval=2.0, timeout=3600, client=None):
+    """
+    Export the catalog and make the SKU and title finders of utils.shopify_api use it.
+
+    Returns:
+        CatalogIndex: The installed maps, or None if the export failed
+        (the finders then keep paging through the API).
+    """
+    index = export_catalog(poll_interval, timeout, client=client)
+    if index is None:
+        return None
+    install_catalog_index(index.skus, index.variant_ids, index.product_titles, index.collection_titles,
+                          index.smart_collection_titles)
+    print(f"📇 Indexed {len(index.skus)} SKU(s), {len(index.product_titles)} product title(s) "
+          f"and {len(index.collection_titles) + len(index.smart_collection_titles)} collection(s) "
+          f"from one bulk export")
+    return index
+
+
+# ------------------ BULK PRODUCT IMPORT ------------------
+
+# Run once per JSONL line; each line is {"input": ProductInput}
+BULK_PRODUCT_CREATE_MUTATION = """
+mutation call($input: ProductInput!) {
+  productCreate(input: $input) {
+    product {
+      id
+      variants(first: 1) { edges { node { id sku } } }
+    }
+    userErrors { field message }
+  }
+}
+"""
+
+
+def write_product_jsonl(rows, path):
+    """
+    Write one productCreate variables line per sku_master.csv row.
+
+    Returns:
+        list: The SKUs in line order (results refer back by line number).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    skus = []
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({"input": product_input(row)}) + "\n")
+            skus.append(row["SKU"])
+    return skus
+
+
+def bulk_create_products(rows, jsonl_path, poll_interval=2.0, timeout=3600, client=None):
+    """
+    Create many products with one bulkOperationRunMutation.
+
+    The rows are compiled into a JSONL file, staged, and run as a single
+    job; its result file is streamed back into the SKU index.
+
+    Args:
+        rows (iterable): sku_master.csv rows (dicts or Series) of new products.
+        jsonl_path (str): Where to write the staged variables file.
+
+    Returns:
+        tuple: (created, errors): SKU -> REST product ID for every product
+        created, and SKU -> list of error messages for every row that was
+        not. If the job failed partway, the rows it created before failing
+        are still in `created`; rows it never reached are in `errors`.
+    """
+    skus = write_product_jsonl(rows, jsonl_path)
+    if not skus:
+        return {}, {}
+    print(f"📤 Importing {len(skus)} product(s) in one bulk operation...")
+    operation = run_bulk_mutation(BULK_PRODUCT_CREATE_MUTATION, jsonl_path, poll_interval, timeout,
+                                  client=client)
+    if operation is None:
+        return {}, {sku: ["bulk operation failed"] for sku in skus}
+
+    created, errors = {}, {}
+    for record in stream_jsonl(operation.get("url") or operation.get("partialDataUrl")):
+        sku = skus[record["__lineNumber"]]
+        if "errors" in record:
+            errors[sku] = [e.get("message", str(e)) for e in record["errors"]]
+            continue
+        payload = record["data"]["productCreate"]
+        if payload["userErrors"] or not payload["product"]:
+            errors[sku] = [e["message"] for e in payload["userErrors"]] or ["no product returned"]
+            continue
+        product = payload["product"]
+        product_id = legacy_id(product["id"])
+        variants = product["variants"]["edges"]
+        register_sku(sku, product_id, legacy_id(variants[0]["node"]["id"]) if variants else None)
+        created[sku] = product_id
+    missing = "no result line" if operation["status"] == "COMPLETED" else "bulk operation failed"
+    for sku in skus:
+        if sku not in created and sku not in errors:
+            errors[sku] = [missing]
+    print(f"📦 Bulk import: {len(created)} created, {len(errors)} failed")
+    return created, errors
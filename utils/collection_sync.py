@@ -0,0 +1,106 @@
+from utils.bulk_operations import legacy_id
+from utils.product_upsert import collection_gid
+from utils.shopify_api import MAX_PAGE_SIZE, graphql_query
+from utils.staged_uploads import product_gid
+
+# Collection membership in batches: a collection's current products are
+# read once, then the missing ones are added and the stale ones removed
+# with up to 250 product IDs per mutation, instead of one collects.json
+# POST per product.
+
+COLLECTION_PRODUCTS_QUERY = """
+query collectionProducts($id: ID!, $first: Int!, $after: String) {
+  collection(id: $id) {
+    products(first: $first, after: $after) {
+      nodes { id }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+COLLECTION_ADD_PRODUCTS_MUTATION = """
+mutation collectionAddProducts($id: ID!, $productIds: [ID!]!) {
+  collectionAddProducts(id: $id, productIds: $productIds) {
+    collection { id }
+    userErrors { field message }
+  }
+}
+"""
+
+COLLECTION_REMOVE_PRODUCTS_MUTATION = """
+mutation collectionRemoveProducts($id: ID!, $productIds: [ID!]!) {
+  collectionRemoveProducts(id: $id, productIds: $productIds) {
+    job { id }
+    userErrors { field message }
+  }
+}
+"""
+
+
+def collection_product_ids(collection_id, client=None):
+    """REST IDs of every product in a collection, or None if the read failed."""
+    members, after = set(), None
+    while True:
+        variables = {"id": collection_gid(collection_id), "first": MAX_PAGE_SIZE, "after": after}
+        result = graphql_query(COLLECTION_PRODUCTS_QUERY, variables, client=client)
+        if "errors" in result or not result.get("data", {}).get("collection"):
+            print(f"❌ Could not read products of collection {collection_id}: {result.get('errors')}")
+            return None
+        products = result["data"]["collection"]["products"]
+        members.update(legacy_id(node["id"]) for node in products["nodes"])
+        if not products["pageInfo"]["hasNextPage"]:
+            return members
+        after = products["pageInfo"]["endCursor"]
+
+
+def _batched(mutation, name, collection_id, product_ids, client=None):
+    """Send `product_ids` through `mutation` in batches of 250; returns the IDs that succeeded."""
+    done = []
+    product_ids = sorted(product_ids)
+    for start in range(0, len(product_ids), MAX_PAGE_SIZE):
+        batch = product_ids[start:start + MAX_PAGE_SIZE]
+        variables = {"id": collection_gid(collection_id), "productIds": [product_gid(p) for p in batch]}
+        result = graphql_query(mutation, variables, client=client)
+        if "errors" in result:
+            print(f"❌ {name} failed: {result['errors']}")
+            continue
+        errors = result["data"][name]["userErrors"]
+        if errors:
+            print(f"❌ {name} failed: {errors}")
+            continue
+        done.extend(batch)
+    return done
+
+
+def sync_collection_members(collection_id, product_ids, remove_stale=True, current=None, client=None):
+    """
+    Make a custom collection hold exactly `product_ids`.
+
+    Args:
+        collection_id: REST or GraphQL collection ID.
+        product_ids (iterable): REST IDs of the products that belong in it.
+        remove_stale (bool): Also remove products that are not in `product_ids`.
+        current (set): Current member REST IDs, if already known (e.g. from
+            a bulk catalog export); read from Shopify otherwise.
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        dict: {"added", "removed", "failed"}: lists of product IDs, plus
+        "unchanged": how many were already members. None if the current
+        members could not be read.
+    """
+    if current is None:
+        current = collection_product_ids(collection_id, client=client)
+        if current is None:
+            return None
+    wanted = {int(p) for p in product_ids}
+    to_add = wanted - current
+    to_remove = current - wanted if remove_stale else set()
+
+    added = _batched(COLLECTION_ADD_PRODUCTS_MUTATION, "collectionAddProducts",
+                     collection_id, to_add, client=client) if to_add else []
+    removed = _batched(COLLECTION_REMOVE_PRODUCTS_MUTATION, "collectionRemoveProducts",
+                       collection_id, to_remove, client=client) if to_remove else []
+    failed = sorted((to_add - set(added)) | (to_remove - set(removed)))
+    return {"added": added, "removed": removed, "unchanged": len(wanted & current), "failed": failed}
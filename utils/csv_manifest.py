@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+# Columns that identify a row in each deploy CSV
+ROW_KEYS = {
+    "sku_master.csv": ["SKU"],
+    "page_url.csv": ["Page Name"],
+    "page_sku.csv": ["Page Name", "SKU"],
+    "sku_images.csv": ["SKU"],
+    "sku_images_alt.csv": ["SKU"],
+    "pages.csv": ["Title"],
+    "navigation_links.csv": ["Menu Name", "Link Title"],
+}
+
+
+def row_key(filename, row):
+    """Identity of a CSV row, e.g. "Summer|SKU-001" for page_sku.csv."""
+    return "|".join(str(row[col]) for col in ROW_KEYS[filename])
+
+
+def row_hash(row):
+    """Content hash of a CSV row; blank cells and column order do not matter."""
+    values = {col: ("" if pd.isna(value) else str(value)) for col, value in row.items()}
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CsvDiff:
+    """Rows of one CSV that were added, changed or removed since the last deploy."""
+
+    def __init__(self, filename, added, changed, removed, unchanged):
+        self.filename = filename
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.unchanged = unchanged
+
+    @property
+    def pending(self):
+        """Added and changed rows, in CSV order: the rows to send to Shopify."""
+        return pd.concat([self.added, self.changed]).sort_index()
+
+    def summary(self):
+        return (f"🧮 {self.filename}: {len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.removed)} removed ({self.unchanged} unchanged)")
+
+
+class CsvManifest:
+    """
+    Per-row content hashes of the deploy CSVs, as of the last deploy.
+
+    diff() compares a freshly read CSV with the manifest. Rows are marked
+    once Shopify has them, and save() writes the manifest back: marked rows
+    get their new hash, changed rows that failed keep the old one (so they
+    show up as changed again next run) and removed rows are dropped.
+
+    Args:
+        path (str): Manifest file (JSON), kept next to the CSVs.
+        full (bool): Ignore the stored hashes and treat every row as added.
+    """
+
+    def __init__(self, path, full=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stored = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._stored = json.load(f)
+        self._full = full
+        self._next = {}
+        self._changed = {}
+
+    def diff(self, filename, df):
+        """Split `df` (the current contents of `filename`) against the manifest."""
+        stored = {} if self._full else self._stored.get(filename, {})
+        keys = df.apply(lambda row: row_key(filename, row), axis=1) if len(df) else pd.Series(dtype=str)
+        hashes = df.apply(row_hash, axis=1) if len(df) else pd.Series(dtype=str)
+
+        is_new = ~keys.isin(list(stored))
+        is_changed = ~is_new & (hashes != keys.map(stored))
+        removed = sorted(set(stored) - set(keys))
+
+        with self._lock:
+            self._next[filename] = {key: stored[key] for key in keys[~is_new]}
+            self._changed[filename] = set(keys[is_changed])
+        return CsvDiff(filename, df[is_new], df[is_changed], removed,
+                       int((~is_new & ~is_changed).sum()))
+
+    def changed(self, filename, row):
+        """True if this row existed at the last deploy and has since been edited."""
+        return row_key(filename, row) in self._changed.get(filename, ())
+
+    def mark(self, filename, row):
+        """Record that Shopify now has this version of the row."""
+        with self._lock:
+            self._next.setdefault(filename, {})[row_key(filename, row)] = row_hash(row)
+
+    def save(self):
+        with self._lock:
+            manifest = dict(self._stored, **self._next)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images go up as they are
+    Image = None
+
+# Resize/recompress settings; every field is part of the cache key
+DEFAULT_SETTINGS = {
+    "max_dimension": 2048,  # longest side, in pixels
+    "jpeg_quality": 85,
+    "webp": False,          # emit WebP instead of the source format
+    "webp_quality": 80,
+}
+
+OPTIMIZED_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+
+
+def cache_dir_for(image_path):
+    """Default cache folder: `.optimized` next to the source image."""
+    return os.path.join(os.path.dirname(image_path), ".optimized")
+
+
+def _cache_name(image_path, settings, ext):
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return f"{stem}-{digest.hexdigest()[:16]}{ext}"
+
+
+def optimize_image(image_path, settings=None, cache_dir=None):
+    """
+    Resize, strip metadata and recompress one image, caching the result.
+
+    The cached file is named after a hash of the source bytes plus the
+    settings, so an unchanged image is processed once. EXIF orientation is
+    applied to the pixels before the metadata is dropped. If Pillow is not
+    installed or the format is not JPEG/PNG, the source path is returned;
+    so is a source without EXIF that the result is not smaller than (one
+    with EXIF would upload its metadata and, on viewers that ignore the
+    orientation tag, display rotated).
+
+    Args:
+        image_path (str): Source image.
+        settings (dict): Overrides for DEFAULT_SETTINGS.
+        cache_dir (str): Where optimized files go; defaults to cache_dir_for().
+
+    Returns:
+        str: Path of the file to upload.
+    """
+    ext = os.path.splitext(image_path)[1].lower()
+    if Image is None or ext not in OPTIMIZED_FORMATS:
+        return image_path
+
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    out_ext = ".webp" if settings["webp"] else ext
+    cache_dir = cache_dir or cache_dir_for(image_path)
+    out_path = os.path.join(cache_dir, _cache_name(image_path, settings, out_ext))
+
+    if not os.path.exists(out_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with Image.open(image_path) as im:
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((settings["max_dimension"], settings["max_dimension"]))
+            if settings["webp"]:
+                fmt, options = "WEBP", {"quality": settings["webp_quality"], "method": 6}
+            elif OPTIMIZED_FORMATS[ext] == "JPEG":
+                fmt, options = "JPEG", {"quality": settings["jpeg_quality"],
+                                        "optimize": True, "progressive": True}
+                if im.mode not in ("RGB", "L"):
+                    im = im.convert("RGB")
+            else:
+                fmt, options = "PNG", {"optimize": True}
+            # Written under a temporary name so parallel runs never see a partial file
+            tmp_path = f"{out_path}.{os.getpid()}.tmp"
+            im.save(tmp_path, fmt, **options)
+        os.replace(tmp_path, out_path)
+
+    if (not settings["webp"] and os.path.getsize(out_path) >= os.path.getsize(image_path)
+            and not _has_exif(image_path)):
+        return image_path
+    return out_path
+
+
+def _has_exif(image_path):
+    # Reads the header only; the pixels are not decoded
+    with Image.open(image_path) as im:
+        return bool(im.getexif())
+
+
+def _optimize_one(job):
+    image_path, settings, cache_dir = job
+    try:
+        return image_path, optimize_image(image_path, settings, cache_dir)
+    except Exception as e:
+        print(f"⚠️ Could not optimize {image_path}: {e}")
+        return image_path, image_path
+
+
+def optimize_images(image_paths, settings=None, cache_dir=None, workers=None):
+    """
+    Optimize many images on all cores.
+
+    Args:
+        image_paths (iterable): Source images; missing files and duplicates are skipped.
+        settings (dict): Overrides for DEFAULT_SETTINGS.
+        cache_dir (str): Shared cache folder; defaults to one next to each image.
+        workers (int): Processes to use; defaults to the CPU count.
+
+    Returns:
+        dict: Source path -> path to upload (the source itself when not optimized).
+    """
+    paths = sorted({p for p in image_paths if os.path.isfile(p)})
+    if Image is None:
+        print("⚠️ Pillow is not installed; uploading images unoptimized")
+        return {p: p for p in paths}
+    if not paths:
+        return {}
+
+    jobs = [(p, settings, cache_dir) for p in paths]
+    # Spawned, not forked: callers (e.g. a deploy.py step) run on threads while
+    # others hold HTTP sessions and locks, which a forked child would inherit
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        optimized = dict(pool.map(_optimize_one, jobs, chunksize=max(1, len(jobs) // 64)))
+
+    before = sum(os.path.getsize(p) for p in paths)
+    after = sum(os.path.getsize(p) for p in optimized.values())
+    print(f"🗜️ Optimized {len(paths)} image(s): {before / 1024:.0f} KiB → {after / 1024:.0f} KiB")
+    return optimized
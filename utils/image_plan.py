@@ -0,0 +1,246 @@
+import os
+
+import pandas as pd
+
+from utils.image_registry import media_source_url, update_media_alt, upload_product_images_deduped
+from utils.shopify_api import graphql_query, image_view_name
+from utils.staged_uploads import product_gid
+
+# One image pass per product: sku_images.csv and sku_images_alt.csv are
+# joined into a single ordered list per SKU, which is then reconciled with
+# the media the product already has on Shopify.
+
+PRODUCT_MEDIA_QUERY = """
+query productMedia($id: ID!) {
+  product(id: $id) {
+    media(first: 250) {
+      nodes {
+        id
+        alt
+        preview { image { url } }
+      }
+    }
+  }
+}
+"""
+
+PRODUCT_DELETE_MEDIA_MUTATION = """
+mutation productDeleteMedia($productId: ID!, $mediaIds: [ID!]!) {
+  productDeleteMedia(productId: $productId, mediaIds: $mediaIds) {
+    deletedMediaIds
+    mediaUserErrors { field message }
+  }
+}
+"""
+
+PRODUCT_REORDER_MEDIA_MUTATION = """
+mutation productReorderMedia($id: ID!, $moves: [MoveInput!]!) {
+  productReorderMedia(id: $id, moves: $moves) {
+    job { id }
+    mediaUserErrors { field message }
+  }
+}
+"""
+
+
+class PlannedImage:
+    """One image in a product's final gallery: file, 1-based position and ALT text."""
+
+    def __init__(self, filename, position, alt):
+        self.filename = filename
+        self.position = position
+        self.alt = alt
+
+    def __repr__(self):
+        return f"PlannedImage({self.filename!r}, {self.position}, {self.alt!r})"
+
+
+def build_image_plan(images_df, images_alt_df, skus=None):
+    """
+    Join the two image CSVs into one ordered gallery per SKU.
+
+    Files keep their CSV order: sku_images.csv first, then any extra files
+    from sku_images_alt.csv. A file listed twice for a SKU is kept once.
+    ALT text is "<Base ALT Text> - <view>" when sku_images_alt.csv has a
+    base for the SKU, otherwise just the positional view name.
+
+    Args:
+        images_df (DataFrame): sku_images.csv rows.
+        images_alt_df (DataFrame): sku_images_alt.csv rows.
+        skus (iterable): Only plan these SKUs; defaults to every SKU in either CSV.
+
+    Returns:
+        dict: SKU -> list of PlannedImage, in position order.
+    """
+    files, base_alts = {}, {}
+    for df, columns in ((images_df, lambda row: [c for c in row.index if c != 'SKU']),
+                        (images_alt_df, lambda row: [f"Image {i} Filename" for i in range(1, 4)])):
+        for _, row in df.iterrows():
+            sku = row['SKU']
+            ordered = files.setdefault(sku, [])
+            for col in columns(row):
+                if pd.notna(row.get(col)) and row[col] not in ordered:
+                    ordered.append(row[col])
+            if pd.notna(row.get('Base ALT Text')):
+                base_alts[sku] = row['Base ALT Text']
+
+    wanted = set(files) if skus is None else set(skus)
+    plan = {}
+    for sku, filenames in files.items():
+        if sku not in wanted:
+            continue
+        plan[sku] = []
+        for position, filename in enumerate(filenames, start=1):
+            alt = image_view_name(position)
+            if sku in base_alts:
+                alt = f"{base_alts[sku]} - {alt}"
+            plan[sku].append(PlannedImage(filename, position, alt))
+    return plan
+
+
+def current_media(product_id, client=None):
+    """The product's media as [{"id", "alt", "preview"}] in gallery order, or None on error."""
+    result = graphql_query(PRODUCT_MEDIA_QUERY, {"id": product_gid(product_id)}, client=client)
+    if "errors" in result or not result.get("data", {}).get("product"):
+        print(f"❌ Could not read media for product {product_id}: {result.get('errors')}")
+        return None
+    return result["data"]["product"]["media"]["nodes"]
+
+
+def _mutate(mutation, name, variables, client=None):
+    result = graphql_query(mutation, variables, client=client)
+    if "errors" in result:
+        print(f"❌ {name} failed: {result['errors']}")
+        return False
+    errors = result["data"][name]["mediaUserErrors"]
+    if errors:
+        print(f"❌ {name} failed: {errors}")
+        return False
+    return True
+
+
+def reorder_moves(actual, wanted):
+    """
+    productReorderMedia moves that turn the `actual` order into `wanted`.
+
+    Shopify applies the moves one after another, each taking an item out
+    and inserting it at its new position, so every move is checked against
+    a working copy that already has the earlier moves applied.
+    """
+    working, moves = list(actual), []
+    for position, media_id in enumerate(wanted):
+        if position < len(working) and working[position] == media_id:
+            continue
+        working.remove(media_id)
+        working.insert(position, media_id)
+        moves.append({"id": media_id, "newPosition": str(position)})
+    return moves
+
+
+def reconcile_product_images(product_id, images, registry, delete_unplanned=True, client=None):
+    """
+    Make a product's gallery match `images` with as few calls as possible.
+
+    Current media is read once and matched to the planned files through
+    the content-hash registry. Media the registry recorded for this product
+    that is no longer planned is deleted (media it does not know, such as
+    images added in the admin, is kept), kept media whose ALT text differs
+    gets one productUpdateMedia, missing files
+    are linked or uploaded (utils.image_registry), and a single
+    productReorderMedia fixes the order if it is off.
+
+    Args:
+        product_id: REST or GraphQL product ID.
+        images (list): (local path, ALT text) pairs in final gallery order.
+        registry (ImageRegistry): Content hash -> product media records.
+        delete_unplanned (bool): Delete recorded media that is not in `images`.
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        dict: Counts per action ("created", "alt_updated", "deleted",
+        "reordered", "unchanged", "failed") plus "bytes_uploaded", or None
+        if the product's media could not be read.
+    """
+    current = current_media(product_id, client=client)
+    if current is None:
+        return None
+    current_alt = {media["id"]: media["alt"] for media in current}
+    counts = dict.fromkeys(("created", "alt_updated", "deleted", "reordered", "unchanged", "failed",
+                            "bytes_uploaded"), 0)
+
+    # Registry records whose media was removed on Shopify are stale; the
+    # others get the CDN URL that was not published yet when they were created
+    current_url = {media["id"]: media_source_url(media) for media in current}
+    for digest, entry in registry.media_for(product_id).items():
+        if entry["media_id"] not in current_alt:
+            registry.forget(digest, product_id)
+        elif current_url[entry["media_id"]] and not registry.source_url(digest):
+            registry.record(digest, product_id, entry["media_id"], entry["alt"], current_url[entry["media_id"]])
+
+    desired, to_create, alt_updates, seen = [], [], [], set()
+    for path, alt in images:
+        if not os.path.isfile(path):
+            print(f"⚠️ Image file not found: {path}")
+            counts["failed"] += 1
+            continue
+        digest = registry.file_hash(path)
+        if digest in seen:
+            continue  # same bytes already planned for this product
+        seen.add(digest)
+        entry = registry.lookup(digest, product_id)
+        if entry:
+            if current_alt[entry["media_id"]] != alt:
+                alt_updates.append((entry["media_id"], alt, digest))
+            else:
+                counts["unchanged"] += 1
+            desired.append(entry["media_id"])
+        else:
+            to_create.append((len(desired), path, alt))
+            desired.append(None)
+
+    # Only media this tool put there; an empty or lost registry deletes nothing
+    recorded = {entry["media_id"] for entry in registry.media_for(product_id).values()}
+    unplanned = [media["id"] for media in current
+                 if media["id"] not in desired and media["id"] in recorded] if delete_unplanned else []
+    if unplanned:
+        if _mutate(PRODUCT_DELETE_MEDIA_MUTATION, "productDeleteMedia",
+                   {"productId": product_gid(product_id), "mediaIds": unplanned}, client=client):
+            counts["deleted"] = len(unplanned)
+            for digest, entry in registry.media_for(product_id).items():
+                if entry["media_id"] in unplanned:
+                    registry.forget(digest, product_id)
+        else:
+            counts["failed"] += len(unplanned)
+            unplanned = []
+
+    if alt_updates:
+        if update_media_alt(product_id, [(media_id, alt) for media_id, alt, _ in alt_updates],
+                            client=client):
+            for media_id, alt, digest in alt_updates:
+                registry.record(digest, product_id, media_id, alt)
+            counts["alt_updated"] = len(alt_updates)
+        else:
+            counts["failed"] += len(alt_updates)
+
+    if to_create:
+        created = upload_product_images_deduped(product_id, [(path, alt) for _, path, alt in to_create],
+                                                registry, client=client)
+        for (index, path, _), media in zip(to_create, created):
+            if media:
+                desired[index] = media["id"]
+                counts["created"] += 1
+                if media["action"] == "uploaded":
+                    counts["bytes_uploaded"] += os.path.getsize(path)
+            else:
+                counts["failed"] += 1
+
+    # New media lands at the end of the gallery; move everything into plan order
+    remaining = [media["id"] for media in current if media["id"] not in unplanned]
+    actual = remaining + [desired[index] for index, _, _ in to_create if desired[index]]
+    wanted = [media_id for media_id in desired if media_id]
+    wanted += [media_id for media_id in actual if media_id not in wanted]
+    moves = reorder_moves(actual, wanted)
+    if moves and _mutate(PRODUCT_REORDER_MEDIA_MUTATION, "productReorderMedia",
+                         {"id": product_gid(product_id), "moves": moves}, client=client):
+        counts["reordered"] = len(moves)
+    return counts
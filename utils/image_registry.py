@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from utils.shopify_api import graphql_query
+from utils.staged_uploads import attach_media, product_gid, upload_product_images_staged
+
+PRODUCT_UPDATE_MEDIA_MUTATION = """
+mutation productUpdateMedia($productId: ID!, $media: [UpdateMediaInput!]!) {
+  productUpdateMedia(productId: $productId, media: $media) {
+    media { id alt }
+    mediaUserErrors { field message }
+  }
+}
+"""
+
+
+MEDIA_STATUS_QUERY = """
+query mediaStatus($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on Media {
+      id
+      status
+      preview { image { url } }
+    }
+  }
+}
+"""
+
+# How long an upload of a shared image waits for Shopify to publish its CDN URL
+MEDIA_READY_TIMEOUT = 30
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageRegistry:
+    """
+    Which product already holds which image, keyed by file content hash.
+
+    Persisted as JSON between runs:
+        {sha256: {"source_url": CDN URL or null,
+                  "products": {product_id: {"media_id": ..., "alt": ...}}}}
+
+    The same bytes under a different filename, or listed twice for one
+    SKU, hash the same, so they are recognised as one image.
+
+    Images marked shared (planned for several products) are uploaded by
+    one thread at a time: the others wait for its CDN URL and link it.
+
+    Args:
+        path (str): Registry file (JSON); parent folders are created.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hashes = {}  # (path, size, mtime) -> sha256
+        self._images = {}
+        self._shared = set()
+        self._uploading = {}  # sha256 -> Event set once its upload finished
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._images = json.load(f)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = file_sha256(path)  # hashed outside the lock; a race only hashes twice
+            with self._lock:
+                self._hashes[key] = digest
+        return digest
+
+    def lookup(self, digest, product_id):
+        """The {"media_id", "alt"} entry if this product already has the image, else None."""
+        with self._lock:
+            entry = self._images.get(digest, {}).get("products", {}).get(str(product_id))
+            return dict(entry) if entry else None
+
+    def source_url(self, digest):
+        """A Shopify CDN URL holding these bytes, if any product has them."""
+        with self._lock:
+            return self._images.get(digest, {}).get("source_url")
+
+    def record(self, digest, product_id, media_id, alt, source_url=None):
+        with self._lock:
+            image = self._images.setdefault(digest, {"source_url": None, "products": {}})
+            image["products"][str(product_id)] = {"media_id": media_id, "alt": alt}
+            if source_url:
+                image["source_url"] = source_url
+
+    def media_for(self, product_id):
+        """Content hash -> {"media_id", "alt"} for every image recorded on a product."""
+        product_id = str(product_id)
+        with self._lock:  # snapshot: other products' uploads record into the registry meanwhile
+            return {digest: dict(image["products"][product_id]) for digest, image in self._images.items()
+                    if product_id in image["products"]}
+
+    def share(self, digests):
+        """Mark images planned for more than one product."""
+        with self._lock:
+            self._shared.update(digests)
+
+    def is_shared(self, digest):
+        with self._lock:
+            return digest in self._shared
+
+    def claim_upload(self, digest):
+        """True if the caller should upload the image; False if another thread already is."""
+        with self._lock:
+            if digest in self._uploading:
+                return False
+            self._uploading[digest] = threading.Event()
+            return True
+
+    def release_upload(self, digest):
+        with self._lock:
+            done = self._uploading.get(digest)
+        if done:
+            done.set()
+
+    def wait_for_source_url(self, digest, timeout=MEDIA_READY_TIMEOUT):
+        """Wait for another thread's upload of the image; its CDN URL, or None."""
+        with self._lock:
+            done = self._uploading.get(digest)
+        if done:
+            done.wait(timeout)
+        return self.source_url(digest)
+
+    def forget(self, digest, product_id):
+        """Drop a product's record of an image (e.g. after its media was deleted)."""
+        with self._lock:
+            image = self._images.get(digest)
+            if image is None:
+                return
+            image["products"].pop(str(product_id), None)
+            if not image["products"]:
+                # No product holds the bytes any more, so the CDN URL is gone too
+                image["source_url"] = None
+
+    def save(self):
+        """Write the registry; safe to call after every product (the file is replaced atomically)."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._images, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def update_media_alt(product_id, updates, client=None):
+    """
+    Change the ALT text of existing media in one productUpdateMedia mutation.
+
+    Args:
+        updates (list): (media ID, new ALT text) pairs.
+
+    Returns:
+        bool: True on success.
+    """
+    variables = {
+        "productId": product_gid(product_id),
+        "media": [{"id": media_id, "alt": alt} for media_id, alt in updates],
+    }
+    result = graphql_query(PRODUCT_UPDATE_MEDIA_MUTATION, variables, client=client)
+    if "errors" in result:
+        print(f"❌ productUpdateMedia failed: {result['errors']}")
+        return False
+    errors = result["data"]["productUpdateMedia"]["mediaUserErrors"]
+    if errors:
+        print(f"❌ productUpdateMedia failed: {errors}")
+        return False
+    return True
+
+
+def media_source_url(media):
+    """CDN URL of created media; None until Shopify has processed the image."""
+    image = (media.get("preview") or {}).get("image") or {}
+    return image.get("url")
+
+
+def wait_for_media_urls(media_ids, timeout=MEDIA_READY_TIMEOUT, poll_interval=1.0, client=None):
+    """
+    Poll new media until Shopify has processed it.
+
+    Returns:
+        dict: Media ID -> CDN URL for the media that became READY in time.
+    """
+    urls, waiting = {}, list(media_ids)
+    deadline = time.monotonic() + timeout
+    while waiting and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        result = graphql_query(MEDIA_STATUS_QUERY, {"ids": waiting}, client=client)
+        if "errors" in result:
+            print(f"❌ Could not poll media status: {result['errors']}")
+            break
+        for media in result["data"]["nodes"]:
+            if not media:
+                continue
+            if media_source_url(media):
+                urls[media["id"]] = media_source_url(media)
+            if media_source_url(media) or media.get("status") == "FAILED":
+                waiting.remove(media["id"])
+    return urls
+
+
+def upload_product_images_deduped(product_id, images, registry, client=None):
+    """
+    Give a product its images, transferring each distinct file at most once.
+
+    For every (path, ALT text):
+      - the product already has these bytes with this ALT  -> skipped
+      - the product has them with another ALT             -> ALT update
+      - the same bytes appear earlier in `images`         -> skipped
+      - another product has them on the Shopify CDN       -> attached from that URL
+      - another thread is uploading them (shared image)   -> waits, then attached
+      - otherwise                                         -> staged upload
+
+    A shared image's upload is polled until Shopify publishes its CDN URL,
+    so the other products that plan it link it instead of transferring it.
+
+    Returns:
+        list: One entry per image: a dict with the media "id" and an
+        "action" ("exists", "alt_updated", "duplicate", "linked",
+        "uploaded"), or None if it failed.
+    """
+    results = [None] * len(images)
+    uploads, links, alt_updates = [], [], []
+    first_seen = {}
+
+    for i, (path, alt) in enumerate(images):
+        if not os.path.isfile(path):
+            uploads.append(i)  # reported as missing by the staged uploader
+            continue
+        digest = registry.file_hash(path)
+        existing = registry.lookup(digest, product_id)
+        if existing and existing["alt"] == alt:
+            results[i] = {"id": existing["media_id"], "action": "exists"}
+        elif existing:
+            alt_updates.append((i, digest, existing["media_id"]))
+        elif digest in first_seen:
+            results[i] = {"index": first_seen[digest], "action": "duplicate"}
+        elif registry.source_url(digest):
+            links.append((i, digest))
+        else:
+            uploads.append(i)
+        first_seen.setdefault(digest, i)
+
+    if alt_updates and update_media_alt(product_id, [(media_id, images[i][1])
+                                                     for i, _, media_id in alt_updates], client=client):
+        for i, digest, media_id in alt_updates:
+            registry.record(digest, product_id, media_id, images[i][1])
+            results[i] = {"id": media_id, "action": "alt_updated"}
+
+    if links:
+        created = attach_media(product_id, [(registry.source_url(d), images[i][1]) for i, d in links],
+                               client=client) or []
+        for (i, digest), media in zip(links, created):
+            registry.record(digest, product_id, media["id"], images[i][1])
+            results[i] = {"id": media["id"], "action": "linked"}
+
+    # Shared images another thread is already uploading are linked afterwards
+    waiting, claimed = [], []
+    for i in list(uploads):
+        path = images[i][0]
+        if not os.path.isfile(path) or not registry.is_shared(registry.file_hash(path)):
+            continue
+        digest = registry.file_hash(path)
+        if registry.claim_upload(digest):
+            claimed.append(digest)
+        else:
+            uploads.remove(i)
+            waiting.append((i, digest))
+
+    try:
+        _upload(product_id, images, uploads, registry, results, client=client)
+    finally:
+        for digest in claimed:
+            registry.release_upload(digest)
+
+    if waiting:
+        links, uploads = [], []
+        for i, digest in waiting:
+            (links if registry.wait_for_source_url(digest) else uploads).append((i, digest))
+        if links:
+            created = attach_media(product_id, [(registry.source_url(d), images[i][1]) for i, d in links],
+                                   client=client) or []
+            for (i, digest), media in zip(links, created):
+                registry.record(digest, product_id, media["id"], images[i][1])
+                results[i] = {"id": media["id"], "action": "linked"}
+        _upload(product_id, images, [i for i, _ in uploads], registry, results, client=client)
+
+    # A duplicate inherits the outcome of the first copy in this batch
+    for i, result in enumerate(results):
+        if result and result["action"] == "duplicate":
+            first = results[result["index"]]
+            results[i] = {"id": first["id"], "action": "duplicate"} if first else None
+
+    skipped = sum(1 for r in results if r and r["action"] in ("exists", "duplicate"))
+    if skipped:
+        print(f"➖ Skipped {skipped} image(s) product {product_id} already has")
+    return results
+
+
+def _upload(product_id, images, indexes, registry, results, client=None):
+    """Staged-upload images[i] for each index into `results`; shared ones wait for their CDN URL."""
+    if not indexes:
+        return
+    created = upload_product_images_staged(product_id, [images[i] for i in indexes], client=client)
+    pending_urls = {}
+    for i, media in zip(indexes, created):
+        if media:
+            digest = registry.file_hash(images[i][0])
+            registry.record(digest, product_id, media["id"], images[i][1], media_source_url(media))
+            results[i] = {"id": media["id"], "action": "uploaded"}
+            if not media_source_url(media) and registry.is_shared(digest):
+                pending_urls[media["id"]] = (digest, images[i][1])
+    # The URL is only published once Shopify has processed the image
+    for media_id, url in wait_for_media_urls(list(pending_urls), client=client).items():
+        digest, alt = pending_urls[media_id]
+        registry.record(digest, product_id, media_id, alt, url)
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+import time
+
+
+class DeployJournal:
+    """
+    Append-only checkpoint log of completed deploy work.
+
+    Each finished unit (product created, collect added, image uploaded,
+    asset pushed, ...) is written as one JSON line keyed by (kind, key) and
+    flushed right away, so a run that dies part-way leaves an accurate
+    record. A resumed run loads the log, skips every unit already in it and
+    reads recorded IDs (e.g. product_id) back without any API lookup. A
+    torn last line from a crash is ignored.
+
+    Args:
+        path (str): Journal file (JSON lines); parent folders are created.
+        resume (bool): Load and extend an existing journal instead of starting over.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._entries[(entry["kind"], entry["key"])] = entry
+            print(f"📒 Resuming from {len(self._entries)} journaled unit(s) in {path}")
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def done(self, kind, key):
+        """True if this unit of work was completed by this or an earlier run."""
+        return (kind, str(key)) in self._entries
+
+    def get(self, kind, key):
+        """The recorded entry for a unit (a dict), or None."""
+        return self._entries.get((kind, str(key)))
+
+    def record(self, kind, key, **data):
+        """Append a completed unit with any IDs worth reusing on resume."""
+        entry = {"kind": kind, "key": str(key), "at": time.time(), **data}
+        with self._lock:
+            self._entries[(kind, entry["key"])] = entry
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,147 @@
+import os
+
+from utils.bulk_operations import legacy_id
+from utils.shopify_api import (find_product_id_by_sku, find_variant_id_by_sku, graphql_query, product_input,
+                               register_sku)
+from utils.staged_uploads import create_staged_targets, product_gid, upload_to_staged_target
+
+# One mutation per product: productCreate carries the variant, SEO fields,
+# collection memberships and staged images together, so a new product costs
+# one call instead of a SKU scan, a POST, collects and an image POST each.
+# Existing products get one productUpdate with the same fields; their
+# galleries are left to the image reconcile step (utils/image_plan.py).
+
+PRODUCT_CREATE_WITH_MEDIA_MUTATION = """
+mutation productCreate($input: ProductInput!, $media: [CreateMediaInput!]) {
+  productCreate(input: $input, media: $media) {
+    product {
+      id
+      handle
+      variants(first: 1) { edges { node { id } } }
+      media(first: 250) { edges { node { id alt } } }
+    }
+    userErrors { field message }
+  }
+}
+"""
+
+PRODUCT_UPDATE_MUTATION = """
+mutation productUpdate($input: ProductInput!) {
+  productUpdate(input: $input) {
+    product { id handle }
+    userErrors { field message }
+  }
+}
+"""
+
+
+def collection_gid(collection_id):
+    collection_id = str(collection_id)
+    if collection_id.startswith("gid://"):
+        return collection_id
+    return f"gid://shopify/Collection/{collection_id}"
+
+
+def upsert_input(product_data, seo=None, collection_ids=(), product_id=None):
+    """
+    ProductInput for a sku_master.csv row plus its SEO fields and collections.
+
+    With `product_id` the input updates that product; the variant is only
+    sent when its ID is known, otherwise Shopify would replace it.
+    """
+    product = product_input(product_data)
+    if seo:
+        product["seo"] = {key: seo[key] for key in ("title", "description") if seo.get(key)}
+    if collection_ids:
+        product["collectionsToJoin"] = [collection_gid(c) for c in collection_ids]
+    if product_id:
+        product["id"] = product_gid(product_id)
+        variant_id = find_variant_id_by_sku(product_data["SKU"])
+        if variant_id:
+            product["variants"][0]["id"] = f"gid://shopify/ProductVariant/{variant_id}"
+        else:
+            del product["variants"]
+    return product
+
+
+def stage_images(images, registry=None, client=None):
+    """
+    Turn local images into CreateMediaInput entries.
+
+    Files whose bytes are already on Shopify (per the content-hash registry)
+    reuse that CDN URL; the rest share one stagedUploadsCreate and are PUT
+    straight from disk. Missing files and failed uploads are left out.
+
+    Returns:
+        list: (local path, CreateMediaInput) pairs in gallery order.
+    """
+    media, to_stage = {}, []
+    for i, (path, alt) in enumerate(images):
+        if not os.path.isfile(path):
+            print(f"⚠️ Image file not found: {path}")
+            continue
+        source_url = registry.source_url(registry.file_hash(path)) if registry else None
+        if source_url:
+            media[i] = {"originalSource": source_url, "alt": alt, "mediaContentType": "IMAGE"}
+        else:
+            to_stage.append(i)
+
+    if to_stage:
+        targets = create_staged_targets([images[i][0] for i in to_stage], client=client) or []
+        for i, target in zip(to_stage, targets):
+            if upload_to_staged_target(target, images[i][0]):
+                media[i] = {"originalSource": target["resourceUrl"], "alt": images[i][1],
+                            "mediaContentType": "IMAGE"}
+    return [(images[i][0], media[i]) for i in sorted(media)]
+
+
+def upsert_product(product_data, images=(), seo=None, collection_ids=(), registry=None, client=None):
+    """
+    Create or update a product, with its variant, SEO, collections and images, in one mutation.
+
+    Args:
+        product_data: sku_master.csv row (dict or Series).
+        images (list): (local path, ALT text) pairs in gallery order; used
+            only when the product is created.
+        seo (dict): Optional {"title", "description"}.
+        collection_ids (list): REST or GraphQL IDs of collections to join.
+        registry (ImageRegistry): Content-hash registry; created media is
+            recorded in it and known files are linked instead of re-uploaded.
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        dict: {"status": "created" | "updated" | "failed", "product_id",
+        "media": number of images attached, "errors": [messages]}.
+    """
+    sku = product_data["SKU"]
+    existing_id = find_product_id_by_sku(sku, client=client)
+    if existing_id:
+        variables = {"input": upsert_input(product_data, seo, collection_ids, product_id=existing_id)}
+        result = graphql_query(PRODUCT_UPDATE_MUTATION, variables, client=client)
+        name, status, staged = "productUpdate", "updated", []
+    else:
+        staged = stage_images(images, registry, client=client)
+        variables = {"input": upsert_input(product_data, seo, collection_ids)}
+        if staged:
+            variables["media"] = [media for _, media in staged]
+        result = graphql_query(PRODUCT_CREATE_WITH_MEDIA_MUTATION, variables, client=client)
+        name, status = "productCreate", "created"
+
+    if "errors" in result:
+        return {"status": "failed", "product_id": existing_id, "media": 0,
+                "errors": [e.get("message", str(e)) for e in result["errors"]]}
+    payload = result["data"][name]
+    if payload["userErrors"]:
+        return {"status": "failed", "product_id": existing_id, "media": 0,
+                "errors": [e["message"] for e in payload["userErrors"]]}
+
+    product = payload["product"]
+    product_id = legacy_id(product["id"])
+    if status == "created":
+        variants = product["variants"]["edges"]
+        register_sku(sku, product_id, legacy_id(variants[0]["node"]["id"]) if variants else None)
+        if registry:
+            # Media comes back in the order it was sent
+            for (path, _), edge in zip(staged, product["media"]["edges"]):
+                registry.record(registry.file_hash(path), product_id, edge["node"]["id"], edge["node"]["alt"])
+    return {"status": status, "product_id": product_id, "media": len(staged), "errors": []}
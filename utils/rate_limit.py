@@ -0,0 +1,175 @@
+import asyncio
+import random
+import threading
+import time
+
+# Standard plans get a 40-call bucket that leaks 2 calls/second; Plus gets 400 at 20/s.
+DEFAULT_BUCKET_SIZE = 40
+DEFAULT_LEAK_RATE = 2.0
+CALL_LIMIT_HEADER = "X-Shopify-Shop-Api-Call-Limit"
+
+
+class RestRateLimiter:
+    """
+    Client-side model of Shopify's REST leaky bucket.
+
+    The bucket fill is re-synced from the X-Shopify-Shop-Api-Call-Limit
+    header ("32/40") after every response and drained at `leak_rate` in
+    between, so acquire() only sleeps when the next call would push the
+    bucket past `capacity - headroom`. Thread-safe, and acquire_async()
+    waits without blocking the event loop, so one limiter can be shared by
+    every thread and coroutine talking to the same store.
+
+    Args:
+        capacity (int): Bucket size; replaced by the header value once seen.
+        leak_rate (float): Calls restored per second.
+        headroom (int): Calls to keep free so a burst never hits 429.
+    """
+
+    def __init__(self, capacity=DEFAULT_BUCKET_SIZE, leak_rate=DEFAULT_LEAK_RATE, headroom=2):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.headroom = headroom
+        self._used = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _drain(self, now):
+        self._used = max(0.0, self._used - (now - self._updated) * self.leak_rate)
+        self._updated = now
+
+    def _try_reserve(self):
+        """Reserve one call and return 0, or return the seconds to wait first."""
+        with self._lock:
+            self._drain(time.monotonic())
+            limit = max(1, self.capacity - self.headroom)
+            if self._used + 1 <= limit:
+                self._used += 1
+                return 0
+            return (self._used + 1 - limit) / self.leak_rate
+
+    def acquire(self):
+        """Block until one more call fits under the limit, then reserve it."""
+        while (wait := self._try_reserve()):
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Coroutine version of acquire()."""
+        while (wait := self._try_reserve()):
+            await asyncio.sleep(wait)
+
+    def update(self, response):
+        """Re-sync the bucket fill from a response's call-limit header."""
+        header = response.headers.get(CALL_LIMIT_HEADER)
+        if not header:
+            return
+        try:
+            used, capacity = (int(part) for part in header.split("/"))
+        except ValueError:
+            return
+        with self._lock:
+            self._used = float(used)
+            self.capacity = capacity
+            self._updated = time.monotonic()
+
+    def penalize(self):
+        """Mark the bucket full after a 429 so other workers back off too."""
+        with self._lock:
+            self._used = float(self.capacity)
+            self._updated = time.monotonic()
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(response, default):
+    """Parse a numeric Retry-After header, falling back to `default`."""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return default
+
+
+# GraphQL Admin API buckets: 1000 points restoring 50/s on standard plans.
+DEFAULT_GRAPHQL_BUCKET = 1000.0
+DEFAULT_RESTORE_RATE = 50.0
+
+
+class GraphQLCostThrottle:
+    """
+    Client-side model of Shopify's GraphQL query-cost bucket.
+
+    Shopify reserves a query's requestedQueryCost up front and refunds the
+    difference to actualQueryCost afterwards, so wait_for() holds a query
+    back until the bucket (restored at `restoreRate` points/second since the
+    last throttleStatus) can cover the cost that same query requested last
+    time. update() re-syncs from each response's extensions.cost block.
+    Thread-safe, with a non-blocking wait_for_async() for coroutines.
+    """
+
+    def __init__(self, maximum=DEFAULT_GRAPHQL_BUCKET, restore_rate=DEFAULT_RESTORE_RATE):
+        self.maximum = maximum
+        self.restore_rate = restore_rate
+        self.last_actual_cost = None
+        self._available = maximum
+        self._updated = time.monotonic()
+        self._requested = {}  # query text -> last requestedQueryCost
+        self._lock = threading.Lock()
+
+    def _estimate(self, now):
+        return min(self.maximum, self._available + (now - self._updated) * self.restore_rate)
+
+    def _try_reserve(self, query):
+        """Reserve `query`'s cost and return 0, or return the seconds to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            available = self._estimate(now)
+            cost = min(self._requested.get(query, 1.0), self.maximum)
+            if available >= cost:
+                self._available = available - cost
+                self._updated = now
+                return 0
+            return (cost - available) / self.restore_rate
+
+    def wait_for(self, query):
+        """Block until the bucket can cover `query`, then reserve its cost."""
+        while (wait := self._try_reserve(query)):
+            time.sleep(wait)
+
+    async def wait_for_async(self, query):
+        """Coroutine version of wait_for()."""
+        while (wait := self._try_reserve(query)):
+            await asyncio.sleep(wait)
+
+    def update(self, query, body):
+        """Record the cost and throttle status reported in a GraphQL response body."""
+        cost = (body.get("extensions") or {}).get("cost") or {}
+        status = cost.get("throttleStatus")
+        with self._lock:
+            if cost.get("requestedQueryCost") is not None:
+                self._requested[query] = float(cost["requestedQueryCost"])
+            if cost.get("actualQueryCost") is not None:
+                self.last_actual_cost = float(cost["actualQueryCost"])
+            if status:
+                self.maximum = float(status["maximumAvailable"])
+                self.restore_rate = float(status["restoreRate"])
+                self._available = float(status["currentlyAvailable"])
+                self._updated = time.monotonic()
+
+    def throttled_delay(self, query):
+        """Seconds until a THROTTLED `query` can be retried."""
+        with self._lock:
+            available = self._estimate(time.monotonic())
+            cost = min(self._requested.get(query, 1.0), self.maximum)
+            return max(0.0, (cost - available) / self.restore_rate)
+
+
+def is_throttled(body):
+    """True if a GraphQL response body carries a THROTTLED error."""
+    return any(
+        (error.get("extensions") or {}).get("code") == "THROTTLED"
+        for error in body.get("errors") or []
+        if isinstance(error, dict)
+    )
@@ -1,33 +1,35 @@
 import os
-import base64
+import threading
+
 import requests
 from dotenv import load_dotenv
 
+from utils.image_optimizer import optimize_image
+from utils.shopify_client import get_default_client
+from utils.streaming_body import asset_attachment_body, product_image_body
+from utils.theme_transform import ThemeTransform
+
 # Load environment variables
 load_dotenv()
-SHOPIFY_STORE_URL = os.getenv('SHOPIFY_STORE_URL')
-SHOPIFY_ACCESS_TOKEN = os.getenv('SHOPIFY_ACCESS_TOKEN')
 THEME_ID = os.getenv('THEME_ID')
-API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2023-10")
 
-# Set headers for authentication
-HEADERS = {
-    "Content-Type": "application/json",
-    "X-Shopify-Access-Token": SHOPIFY_ACCESS_TOKEN
-}
+# Every helper takes an optional `client` (utils.shopify_client.ShopifyClient);
+# without one they share the pooled default client built from .env.
 
 # ------------------ AESTHETIC ENHANCEMENTS ------------------
 
-def upload_asset(filename):
+def upload_asset(filename, client=None):
     """
     Upload a static file (CSS, JS, image, font, etc.) to Shopify's theme assets.
 
     Args:
         filename (str): The filename to upload (must exist inside ASSET_FOLDER).
+        client (ShopifyClient): Client to send through; defaults to the shared one.
 
     Returns:
         bool: True if upload successful, False otherwise.
     """
+    client = client or get_default_client()
     asset_folder = os.getenv("ASSET_FOLDER", "assets")
     full_path = os.path.join(asset_folder, filename)
 
@@ -36,21 +38,14 @@ def upload_asset(filename):
         return False
 
     try:
-        with open(full_path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("utf-8")
+        # Base64 is streamed from disk in chunks rather than built in memory
+        body = asset_attachment_body(f"assets/{filename}", full_path)
     except Exception as e:
         print(f"❌ Failed to read file: {filename} ({e})")
         return False
 
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    payload = {
-        "asset": {
-            "key": f"assets/{filename}",
-            "attachment": encoded
-        }
-    }
-
-    response = requests.put(url, headers=HEADERS, json=payload)
+    url = f"themes/{THEME_ID}/assets.json"
+    response = client.put(url, data=body)
 
     if response.status_code == 200:
         print(f"✅ Uploaded asset: {filename}")
@@ -64,33 +59,26 @@ def upload_asset(filename):
         return False
 
 
-def inject_assets_into_theme(asset_filenames):
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    get_resp = requests.get(url, headers=HEADERS, params={"asset[key]": "layout/theme.liquid"})
-    if get_resp.status_code != 200:
-        print("❌ Failed to get theme.liquid")
-        return False
-    content = get_resp.json()["asset"]["value"]
-    injection_block = "\n".join([
+# Theme file edits are pure str -> str injectors (add_*) so several can be
+# applied to one fetch of the file and uploaded together (utils/theme_transform.py).
+
+def asset_tag_block(asset_filenames):
+    """One <link> (CSS) or deferred <script> (anything else) line per asset."""
+    return "\n".join([
         f'<link href="{{{{ \"/assets/{f}\" | asset_url }}}}" rel="stylesheet">' if f.endswith(".css")
         else f'<script src="{{{{ \"/assets/{f}\" | asset_url }}}}" defer></script>' for f in asset_filenames
     ])
+
+def add_asset_tags(content, asset_filenames):
+    """Add a <link>/<script> tag for each asset before </head>, unless the block is already there."""
+    injection_block = asset_tag_block(asset_filenames)
     if injection_block not in content:
-        content = content.replace("</head>", f"{injection_block}\n</head>")
-        payload = {"asset": {"key": "layout/theme.liquid", "value": content}}
-        put_resp = requests.put(url, headers=HEADERS, json=payload)
         print("✅ Injected assets into theme.liquid")
-        return put_resp.status_code == 200
+        return content.replace("</head>", f"{injection_block}\n</head>")
     print("ℹ️ Assets already present in theme.liquid")
-    return True
+    return content
 
-def inject_scrolling_banner():
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    get_resp = requests.get(url, headers=HEADERS, params={"asset[key]": "templates/index.liquid"})
-    if get_resp.status_code != 200:
-        print("❌ Failed to fetch index.liquid")
-        return False
-    content = get_resp.json()["asset"]["value"]
+def add_scrolling_banner(content):
     banner_html = '''
 <!-- Scrolling Text Banner Start -->
 <div class="scrolling-text-banner">
@@ -101,21 +89,12 @@ def inject_scrolling_banner():
 <!-- Scrolling Text Banner End -->
 '''
     if "scrolling-text-banner" not in content:
-        content = content.replace("</body>", f"{banner_html}\n</body>")
-        payload = {"asset": {"key": "templates/index.liquid", "value": content}}
-        put_resp = requests.put(url, headers=HEADERS, json=payload)
         print("✅ Injected scrolling banner")
-        return put_resp.status_code == 200
+        return content.replace("</body>", f"{banner_html}\n</body>")
     print("ℹ️ Scrolling banner already exists")
-    return True
+    return content
 
-def inject_splash_screen():
-    url = f"{SHOPIFY_STORE_URL}/admin/api/{API_VERSION}/themes/{THEME_ID}/assets.json"
-    get_resp = requests.get(url, headers=HEADERS, params={"asset[key]": "layout/theme.liquid"})
-    if get_resp.status_code != 200:
-        print("❌ Failed to fetch theme.liquid")
-        return False
-    content = get_resp.json()["asset"]["value"]
+def add_splash_screen(content):
     splash_html = '''
 <!-- Splash Screen Loader Start -->
 <div class="splash-screen"><span class="loader-text">Loading</span></div>
@@ -123,25 +102,59 @@ def inject_splash_screen():
 '''
     if "splash-screen" not in content:
         content = content.replace("<body", "<body class=\"transition-body\"")
-        content = content.replace("</body>", f"{splash_html}\n</body>")
-        payload = {"asset": {"key": "layout/theme.liquid", "value": content}}
-        put_resp = requests.put(url, headers=HEADERS, json=payload)
         print("✅ Injected splash screen")
-        return put_resp.status_code == 200
+        return content.replace("</body>", f"{splash_html}\n</body>")
     print("ℹ️ Splash screen already exists")
-    return True
+    return content
+
+def inject_assets_into_theme(asset_filenames, client=None):
+    return ThemeTransform("layout/theme.liquid", THEME_ID).register(add_asset_tags, asset_filenames).run(client=client)
+
+def inject_scrolling_banner(client=None):
+    return ThemeTransform("templates/index.liquid", THEME_ID).register(add_scrolling_banner).run(client=client)
+
+def inject_splash_screen(client=None):
+    return ThemeTransform("layout/theme.liquid", THEME_ID).register(add_splash_screen).run(client=client)
 
 # ------------------ PRODUCT & COLLECTION ------------------
 
-def create_product(product_data):
+def create_product(product_data, client=None):
     """Create a new product if SKU doesn't exist."""
-    existing_product_id = find_product_id_by_sku(product_data["SKU"])
+    client = client or get_default_client()
+    existing_product_id = find_product_id_by_sku(product_data["SKU"], client=client)
     if existing_product_id:
         print(f"Product with SKU {product_data['SKU']} exists. Skipping.")
         return {"status": "exists", "product_id": existing_product_id}
 
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/products.json"
-    payload = {
+    url = "products.json"
+    response = client.post(url, json=product_payload(product_data))
+    result = response.json()
+    product = result.get("product")
+    if product:
+        for variant in product.get("variants", []):
+            register_sku(variant.get("sku"), product["id"], variant.get("id"))
+        if _PRODUCT_TITLES is not None:
+            _PRODUCT_TITLES[product["title"].lower()] = f"gid://shopify/Product/{product['id']}"
+    return result
+
+def update_product(product_id, product_data, client=None):
+    """Update an existing product (title, description, vendor, type, price) from its CSV row."""
+    client = client or get_default_client()
+    payload = product_payload(product_data)
+    variant_id = _VARIANT_IDS.get(product_data["SKU"])
+    if variant_id:
+        payload["product"]["variants"][0]["id"] = variant_id
+    else:
+        # Without the variant ID Shopify would replace the variant; leave it alone
+        del payload["product"]["variants"]
+    payload["product"]["id"] = product_id
+
+    response = client.put(f"products/{product_id}.json", json=payload)
+    return response.json()
+
+def product_payload(product_data):
+    """REST body for creating a product from a sku_master.csv row."""
+    return {
         "product": {
             "title": product_data["Product Name"],
             "body_html": product_data.get("Description", ""),
@@ -155,197 +168,408 @@ def create_product(product_data):
             ]
         }
     }
-    response = requests.post(url, headers=HEADERS, json=payload)
-    return response.json()
 
-def find_product_id_by_sku(sku):
-    """Find product ID by SKU."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/products.json?fields=id,variants"
-    response = requests.get(url, headers=HEADERS)
-    if response.status_code == 200:
-        for product in response.json().get('products', []):
-            for variant in product.get('variants', []):
-                if variant['sku'] == sku:
-                    return product['id']
-    return None
+def product_input(product_data):
+    """GraphQL ProductInput for creating a product from a sku_master.csv row."""
+    # Blank CSV cells arrive as NaN, which is not valid JSON
+    product_data = {key: ("" if value != value else value) for key, value in dict(product_data).items()}
+    return {
+        "title": product_data["Product Name"],
+        "descriptionHtml": product_data.get("Description", ""),
+        "vendor": product_data.get("Brand", ""),
+        "productType": product_data.get("Category", ""),
+        "variants": [
+            {
+                "sku": product_data["SKU"],
+                "price": str(product_data["Price"])
+            }
+        ]
+    }
+
+def find_product_id_by_sku(sku, client=None):
+    """Find product ID by SKU using the cached catalog index."""
+    return load_sku_index(client=client).get(sku)
+
+# ------------------ SKU INDEX ------------------
+
+# SKU -> product ID, loaded once per run by load_sku_index()
+_SKU_INDEX = None
+# False if the catalog listing failed part-way and _SKU_INDEX holds only the pages read
+_SKU_INDEX_COMPLETE = True
+# SKU -> variant ID, filled alongside _SKU_INDEX
+_VARIANT_IDS = {}
+# Held while the index loads, so threads that miss it together page the catalog once
+_SKU_INDEX_LOCK = threading.Lock()
+
+def load_sku_index(force=False, client=None):
+    """
+    Build the SKU -> product ID map for the whole catalog, following pagination.
+
+    The map is cached for the rest of the run; pass force=True to reload it.
+    If the listing fails part-way, the SKUs read so far are cached with a
+    warning rather than the catalog being paged again on every lookup;
+    sku_index_complete() then returns False.
+
+    Returns:
+        dict: SKU -> product ID.
+    """
+    global _SKU_INDEX
+    if _SKU_INDEX is not None and not force:
+        return _SKU_INDEX
+    with _SKU_INDEX_LOCK:
+        if _SKU_INDEX is not None and not force:
+            return _SKU_INDEX  # loaded by another thread while this one waited
+        return _load_sku_index(client)
+
+def _load_sku_index(client=None):
+    global _SKU_INDEX, _SKU_INDEX_COMPLETE
+    index = {}
+    pages = paginate_rest("products.json", "products", params={"fields": "id,variants"},
+                          client=client)
+    for product in pages:
+        for variant in product.get('variants', []):
+            if variant.get('sku'):
+                index[variant['sku']] = product['id']
+                _VARIANT_IDS[variant['sku']] = variant['id']
+    _SKU_INDEX = index
+    _SKU_INDEX_COMPLETE = not pages.failed
+    if pages.failed:
+        print(f"⚠️ Catalog listing failed; SKU index holds only the {len(index)} SKU(s) read so far "
+              f"for the rest of the run")
+    else:
+        print(f"📇 Indexed {len(index)} SKU(s)")
+    return _SKU_INDEX
+
+def sku_index_complete():
+    """False if the loaded SKU index is missing products because the catalog listing failed."""
+    return _SKU_INDEX_COMPLETE
+
+def find_variant_id_by_sku(sku):
+    """Variant ID for a SKU, if the SKU index (or a product created this run) knows it."""
+    return _VARIANT_IDS.get(sku)
+
+def register_sku(sku, product_id, variant_id=None):
+    """Record a newly created product in the SKU index, if it is loaded."""
+    if _SKU_INDEX is not None and sku:
+        _SKU_INDEX[sku] = product_id
+    if sku and variant_id:
+        _VARIANT_IDS[sku] = variant_id
+
+# Lower-cased title -> ID maps, set by install_catalog_index() (e.g. from a
+# bulk export); while unset the title finders page through the API instead.
+_PRODUCT_TITLES = None
+_COLLECTION_TITLES = None  # custom collections
+_SMART_COLLECTION_TITLES = None
+
+def install_catalog_index(skus, variant_ids, product_titles=None, collection_titles=None,
+                          smart_collection_titles=None):
+    """
+    Use lookup maps built elsewhere (utils/bulk_operations.py) for the rest of the run.
 
-def create_collection(collection_data):
+    Args:
+        skus (dict): SKU -> REST product ID.
+        variant_ids (dict): SKU -> REST variant ID.
+        product_titles (dict): Lower-cased title -> product GraphQL ID.
+        collection_titles (dict): Lower-cased title -> REST ID of a custom collection.
+        smart_collection_titles (dict): The same for smart collections.
+    """
+    global _SKU_INDEX, _SKU_INDEX_COMPLETE, _PRODUCT_TITLES, _COLLECTION_TITLES, _SMART_COLLECTION_TITLES
+    _SKU_INDEX = skus
+    _SKU_INDEX_COMPLETE = True
+    _VARIANT_IDS.update(variant_ids)
+    if product_titles is not None:
+        _PRODUCT_TITLES = product_titles
+    if collection_titles is not None:
+        _COLLECTION_TITLES = collection_titles
+    if smart_collection_titles is not None:
+        _SMART_COLLECTION_TITLES = smart_collection_titles
+
+def create_collection(collection_data, client=None):
     """Create a custom collection."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/custom_collections.json"
-    payload = {
+    client = client or get_default_client()
+    url = "custom_collections.json"
+    response = client.post(url, json=collection_payload(collection_data))
+    return response.json()
+
+def update_collection(collection_id, collection_data, client=None):
+    """Update an existing custom collection from its page_url.csv row."""
+    client = client or get_default_client()
+    url = f"custom_collections/{collection_id}.json"
+    response = client.put(url, json=collection_payload(collection_data))
+    return response.json()
+
+def collection_payload(collection_data):
+    """REST body for creating a custom collection from a page_url.csv row."""
+    return {
         "custom_collection": {
             "title": collection_data["Page Name"],
             "handle": collection_data["URL Slug"]
         }
     }
-    response = requests.post(url, headers=HEADERS, json=payload)
-    return response.json()
 
-def find_collection_id_by_title(title):
-    """Find collection ID by title."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/custom_collections.json?fields=id,title"
-    response = requests.get(url, headers=HEADERS)
-    if response.status_code == 200:
-        for collection in response.json().get('custom_collections', []):
+def find_collection_id_by_title(title, include_smart=True, client=None):
+    """
+    Find collection ID by title.
+
+    Smart collections (utils/smart_collections.py) are found too unless
+    `include_smart` is False, as for callers that add products or update
+    custom collections.
+    """
+    if _COLLECTION_TITLES is not None and title.lower() in _COLLECTION_TITLES:
+        return _COLLECTION_TITLES[title.lower()]
+    if include_smart and _SMART_COLLECTION_TITLES is not None and title.lower() in _SMART_COLLECTION_TITLES:
+        return _SMART_COLLECTION_TITLES[title.lower()]
+    resources = ("custom_collections", "smart_collections") if include_smart else ("custom_collections",)
+    for resource in resources:
+        for collection in paginate_rest(f"{resource}.json", resource,
+                                        params={"fields": "id,title"}, client=client):
             if collection['title'].lower() == title.lower():
                 return collection['id']
     return None
 
-def add_product_to_collection(product_id, collection_id):
+def add_product_to_collection(product_id, collection_id, client=None):
     """Add product to collection."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/collects.json"
-    payload = {
+    client = client or get_default_client()
+    url = "collects.json"
+    response = client.post(url, json=collect_payload(product_id, collection_id))
+    return response.json()
+
+def collect_payload(product_id, collection_id):
+    """REST body for adding a product to a custom collection."""
+    return {
         "collect": {
             "product_id": product_id,
             "collection_id": collection_id
         }
     }
-    response = requests.post(url, headers=HEADERS, json=payload)
-    return response.json()
 
 # ------------------ IMAGE MANAGEMENT ------------------
 
-def upload_local_image_to_product(product_id, image_path, position):
-    """Upload a local image with positional ALT text."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/products/{product_id}/images.json"
-
-    try:
-        with open(image_path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode('utf-8')
-    except FileNotFoundError:
-        print(f"❌ File not found: {image_path}")
-        return
-
-    alt_text = {
+def image_view_name(position):
+    """Positional view label used as (or appended to) image ALT text."""
+    return {
         1: "Front View",
         2: "Back View",
         3: "Side View",
         4: "Detail View"
     }.get(position, f"View {position}")
 
-    payload = {
-        "image": {
-            "attachment": encoded,
-            "position": position,
-            "alt": alt_text
-        }
-    }
+def upload_local_image_to_product(product_id, image_path, position, client=None, optimize=None):
+    """
+    Upload a local image with positional ALT text.
 
-    response = requests.post(url, headers=HEADERS, json=payload)
-    print(f"Uploaded {image_path} (Position {position}, ALT: {alt_text})")
-    return response.json()
+    Pass `optimize` (a settings dict, {} for the defaults) to resize and
+    recompress the file through utils.image_optimizer first.
+    """
+    client = client or get_default_client()
+    url = f"products/{product_id}/images.json"
 
-def upload_local_image_to_product_with_alt(product_id, image_path, position, base_alt_text):
-    """Upload image with structured ALT text."""
+    alt_text = image_view_name(position)
     try:
-        with open(image_path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode('utf-8')
+        if optimize is not None:
+            image_path = optimize_image(image_path, optimize)
+        body = product_image_body(image_path, position, alt_text)
     except FileNotFoundError:
         print(f"❌ File not found: {image_path}")
         return
 
-    view_name = {
-        1: "Front View",
-        2: "Back View",
-        3: "Side View",
-        4: "Detail View"
-    }.get(position, f"View {position}")
-
-    structured_alt = f"{base_alt_text} - {view_name}"
+    response = client.post(url, data=body)
+    print(f"Uploaded {image_path} (Position {position}, ALT: {alt_text})")
+    return response.json()
 
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/products/{product_id}/images.json"
-    payload = {
-        "image": {
-            "attachment": encoded,
-            "position": position,
-            "alt": structured_alt
-        }
-    }
+def upload_local_image_to_product_with_alt(product_id, image_path, position, base_alt_text,
+                                           client=None, optimize=None):
+    """Upload image with structured ALT text (optionally optimized first, as above)."""
+    client = client or get_default_client()
+    structured_alt = f"{base_alt_text} - {image_view_name(position)}"
+    try:
+        if optimize is not None:
+            image_path = optimize_image(image_path, optimize)
+        body = product_image_body(image_path, position, structured_alt)
+    except FileNotFoundError:
+        print(f"❌ File not found: {image_path}")
+        return
 
-    response = requests.post(url, headers=HEADERS, json=payload)
+    url = f"products/{product_id}/images.json"
+    response = client.post(url, data=body)
     print(f"Uploaded {image_path} with ALT '{structured_alt}'")
     return response.json()
 
 # ------------------ PAGE MANAGEMENT ------------------
 
-def create_page(page_data):
+def create_page(page_data, client=None):
     """Create a Shopify page."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/pages.json"
-    payload = {
+    client = client or get_default_client()
+    url = "pages.json"
+    response = client.post(url, json=page_payload(page_data))
+    return response.json()
+
+def update_page(page_id, page_data, client=None):
+    """Update an existing page's title and body from its pages.csv row."""
+    client = client or get_default_client()
+    response = client.put(f"pages/{page_id}.json", json=page_payload(page_data))
+    return response.json()
+
+def page_payload(page_data):
+    """REST body for creating a page from a pages.csv row."""
+    return {
         "page": {
             "title": page_data["Title"],
             "body_html": page_data["Body"]
         }
     }
-    response = requests.post(url, headers=HEADERS, json=payload)
-    return response.json()
 
 # ------------------ THEME FILES ------------------
 
-def upload_theme_asset(theme_id, asset_key, asset_value):
+def upload_theme_asset(theme_id, asset_key, asset_value, client=None):
     """Upload a theme file to Shopify."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/themes/{theme_id}/assets.json"
+    client = client or get_default_client()
+    url = f"themes/{theme_id}/assets.json"
     payload = {
         "asset": {
             "key": asset_key,
             "value": asset_value
         }
     }
-    response = requests.put(url, headers=HEADERS, json=payload)
+    response = client.put(url, json=payload)
     print(f"Uploaded asset: {asset_key} (Status: {response.status_code})")
     return response.json()
 
 # ------------------ GRAPHQL HELPERS ------------------
 
-def graphql_query(query, variables=None):
-    """Send a GraphQL query."""
-    url = f"{SHOPIFY_STORE_URL}/admin/api/2023-04/graphql.json"
-    payload = {"query": query, "variables": variables or {}}
-
+def graphql_query(query, variables=None, client=None):
+    """Send a GraphQL query (cost-throttled and retried by the client)."""
+    client = client or get_default_client()
     try:
-        response = requests.post(url, headers=HEADERS, json=payload)
-        response.raise_for_status()
-        return response.json()
+        return client.graphql(query, variables)
     except requests.exceptions.RequestException as e:
         print(f"❌ GraphQL error: {e}")
         return {"errors": [{"message": str(e)}]}
 
+# ------------------ PAGINATION ------------------
+
+MAX_PAGE_SIZE = 250
+
+class _Pages:
+    """
+    Iterator over the items of a paginated read.
+
+    Wraps a page generator so callers can check `failed` after iterating
+    and tell "no match" apart from "the listing broke part-way".
+    """
+
+    def __init__(self, pages):
+        self._items = (item for page in pages for item in page)
+        self.failed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._items)
+
+def paginate_rest(path, resource_key, params=None, page_size=MAX_PAGE_SIZE, client=None):
+    """
+    Stream every record of a REST list endpoint, following Link headers.
+
+    Pages are fetched lazily, so a caller that stops early (e.g. a finder
+    that found its match) does not pay for the remaining pages.
+
+    Args:
+        path (str): Endpoint relative to the API root, e.g. "products.json".
+        resource_key (str): Key holding the records, e.g. "products".
+        params (dict): Extra query parameters for the first request.
+        page_size (int): Records per page (Shopify allows at most 250).
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        _Pages: Iterator of record dicts.
+    """
+    client = client or get_default_client()
+
+    def pages():
+        url = path
+        query = dict(params or {}, limit=min(page_size, MAX_PAGE_SIZE))
+        while url:
+            response = client.get(url, params=query)
+            if response.status_code != 200:
+                print(f"❌ Failed to list {resource_key}: {response.status_code}")
+                result.failed = True
+                return
+            yield response.json().get(resource_key, [])
+            # The next-page URL already carries page_info, fields and limit
+            url = response.links.get("next", {}).get("url")
+            query = None
+
+    result = _Pages(pages())
+    return result
+
+def paginate_graphql(query, connection, variables=None, page_size=MAX_PAGE_SIZE, client=None):
+    """
+    Stream every node of a top-level GraphQL connection, following endCursor.
+
+    The query must declare `$first: Int!` and `$after: String`, pass them
+    to the connection, and select `nodes` plus `pageInfo { hasNextPage endCursor }`.
+
+    Args:
+        query (str): GraphQL query text.
+        connection (str): Name of the connection field under `data`.
+        variables (dict): Extra query variables.
+        page_size (int): Nodes per page (Shopify allows at most 250).
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        _Pages: Iterator of node dicts.
+    """
+    def pages():
+        after = None
+        while True:
+            page_vars = dict(variables or {}, first=min(page_size, MAX_PAGE_SIZE), after=after)
+            data = graphql_query(query, page_vars, client=client)
+            if "errors" in data:
+                print(f"❌ GraphQL error listing {connection}: {data['errors']}")
+                result.failed = True
+                return
+            conn = data["data"][connection]
+            yield conn["nodes"]
+            if not conn["pageInfo"]["hasNextPage"]:
+                return
+            after = conn["pageInfo"]["endCursor"]
+
+    result = _Pages(pages())
+    return result
+
 # ------------------ MENU MANAGEMENT (GRAPHQL) ------------------
 
-def find_navigation_menu_id_by_title(title):
+def find_navigation_menu_id_by_title(title, client=None):
     """Find navigation menu ID by title."""
     query = """
-    {
-      navigationMenus(first: 50) {
-        edges {
-          node {
-            id
-            title
-          }
+    query($first: Int!, $after: String) {
+      navigationMenus(first: $first, after: $after) {
+        nodes {
+          id
+          title
         }
+        pageInfo { hasNextPage endCursor }
       }
     }
     """
-    result = graphql_query(query)
-    if "errors" in result:
-        print(f"❌ GraphQL error: {result['errors']}")
-        return None
-
-    for edge in result["data"]["navigationMenus"]["edges"]:
-        if edge["node"]["title"].lower() == title.lower():
-            return edge["node"]["id"]
+    for menu in paginate_graphql(query, "navigationMenus", client=client):
+        if menu["title"].lower() == title.lower():
+            return menu["id"]
     return None
 
-def add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id=None):
-    """Add a link to a menu."""
-    query = """
-    mutation menuItemCreate($menuItem: MenuItemInput!) {
-      menuItemCreate(menuItem: $menuItem) {
-        menuItem { id }
-        userErrors { field message }
-      }
-    }
-    """
+MENU_ITEM_CREATE_MUTATION = """
+mutation menuItemCreate($menuItem: MenuItemInput!) {
+  menuItemCreate(menuItem: $menuItem) {
+    menuItem { id }
+    userErrors { field message }
+  }
+}
+"""
+
+def menu_item_input(menu_id, link_title, link_type, destination_id=None):
+    """MenuItemInput for a navigation_links.csv row."""
     menu_item = {
         "title": link_title,
         "menuId": menu_id
@@ -355,9 +579,12 @@ def add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id=N
         menu_item["url"] = destination_id
     else:
         menu_item["resourceId"] = destination_id
+    return menu_item
 
-    variables = {"menuItem": menu_item}
-    result = graphql_query(query, variables)
+def add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id=None, client=None):
+    """Add a link to a menu."""
+    variables = {"menuItem": menu_item_input(menu_id, link_title, link_type, destination_id)}
+    result = graphql_query(MENU_ITEM_CREATE_MUTATION, variables, client=client)
 
     if "errors" in result:
         print(f"❌ Error adding link: {result['errors']}")
@@ -366,55 +593,121 @@ def add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id=N
 
     return result
 
-def find_product_id_by_title(title):
+MENU_ITEMS_QUERY = """
+query menu($id: ID!) {
+  menu(id: $id) {
+    title
+    handle
+    items {
+      id title type resourceId url tags
+      items {
+        id title type resourceId url tags
+        items { id title type resourceId url tags }
+      }
+    }
+  }
+}
+"""
+
+MENU_UPDATE_MUTATION = """
+mutation menuUpdate($id: ID!, $title: String!, $handle: String, $items: [MenuItemUpdateInput!]!) {
+  menuUpdate(id: $id, title: $title, handle: $handle, items: $items) {
+    menu { id }
+    userErrors { field message }
+  }
+}
+"""
+
+def _menu_item_update_input(item):
+    """MenuItemUpdateInput that keeps a menu item (and its children) as it is."""
+    keep = {key: item[key] for key in ("id", "title", "type", "resourceId", "url", "tags")
+            if item.get(key) is not None}
+    keep["items"] = [_menu_item_update_input(child) for child in item.get("items", [])]
+    return keep
+
+def replace_link_in_navigation_menu(menu_id, link_title, link_type, destination_id=None, client=None):
+    """
+    Point a menu's top-level link titled `link_title` at a new destination.
+
+    Shopify only edits menu items by rewriting the whole menu, so the menu
+    is read and sent back with that one item changed; other items and
+    their children are kept. Further top-level links with the same title
+    (e.g. added by an earlier run for an edited CSV row) are dropped. A
+    menu without such a link gets it added instead.
+    """
+    result = graphql_query(MENU_ITEMS_QUERY, {"id": menu_id}, client=client)
+    if "errors" in result or not result.get("data", {}).get("menu"):
+        print(f"❌ Could not read menu {menu_id}: {result.get('errors')}")
+        return {"errors": result.get("errors") or [{"message": "menu not found"}]}
+    menu = result["data"]["menu"]
+
+    items, replaced = [], False
+    for item in menu["items"]:
+        if item["title"].lower() != link_title.lower():
+            items.append(_menu_item_update_input(item))
+        elif not replaced:
+            updated = _menu_item_update_input(item)
+            updated.pop("resourceId", None)
+            updated.pop("url", None)
+            updated.update(menu_item_input(menu_id, link_title, link_type, destination_id))
+            del updated["menuId"]
+            updated["type"] = "HTTP" if link_type == "URL" else link_type
+            items.append(updated)
+            replaced = True
+    if not replaced:
+        return add_link_to_navigation_menu(menu_id, link_title, link_type, destination_id, client=client)
+
+    variables = {"id": menu_id, "title": menu["title"], "handle": menu["handle"], "items": items}
+    result = graphql_query(MENU_UPDATE_MUTATION, variables, client=client)
+    errors = result.get("errors") or result.get("data", {}).get("menuUpdate", {}).get("userErrors")
+    if errors:
+        print(f"❌ Error updating link: {errors}")
+        return {"errors": errors}
+    print(f"✏️ Updated link: {link_title}")
+    return result
+
+def find_product_id_by_title(title, client=None):
     """Find product ID by title using GraphQL."""
     query = """
-    {
-      products(first: 50) {
-        edges {
-          node {
-            id
-            title
-          }
+    query($first: Int!, $after: String) {
+      products(first: $first, after: $after) {
+        nodes {
+          id
+          title
         }
+        pageInfo { hasNextPage endCursor }
       }
     }
     """
-    result = graphql_query(query)
-    if "errors" in result:
-        print("❌ Product query failed:", result["errors"])
-        return None
-
-    for edge in result["data"]["products"]["edges"]:
-        if edge["node"]["title"].lower() == title.lower():
-            return edge["node"]["id"]
+    if _PRODUCT_TITLES is not None and title.lower() in _PRODUCT_TITLES:
+        return _PRODUCT_TITLES[title.lower()]
+    # Not indexed (e.g. created this run by a bulk import or an upsert): page through
+    for node in paginate_graphql(query, "products", client=client):
+        if node["title"].lower() == title.lower():
+            if _PRODUCT_TITLES is not None:
+                _PRODUCT_TITLES[title.lower()] = node["id"]
+            return node["id"]
     return None
 
-def find_page_id_by_title(title):
+def find_page_id_by_title(title, client=None):
     """Find page ID by title using GraphQL."""
     query = """
-    {
-      pages(first: 50) {
-        edges {
-          node {
-            id
-            title
-          }
+    query($first: Int!, $after: String) {
+      pages(first: $first, after: $after) {
+        nodes {
+          id
+          title
         }
+        pageInfo { hasNextPage endCursor }
       }
     }
     """
-    result = graphql_query(query)
-    if "errors" in result:
-        print("❌ Page query failed:", result["errors"])
-        return None
-
-    for edge in result["data"]["pages"]["edges"]:
-        if edge["node"]["title"].lower() == title.lower():
-            return edge["node"]["id"]
+    for node in paginate_graphql(query, "pages", client=client):
+        if node["title"].lower() == title.lower():
+            return node["id"]
     return None
 
-def create_navigation_menu(title):
+def create_navigation_menu(title, client=None):
     """Create a new navigation menu (GraphQL)."""
     query = """
     mutation menuCreate($menu: MenuInput!) {
@@ -435,5 +728,5 @@ def create_navigation_menu(title):
             "title": title
         }
     }
-    return graphql_query(query, variables)
+    return graphql_query(query, variables, client=client)
 
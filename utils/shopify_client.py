@@ -0,0 +1,195 @@
+import os
+import time
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from utils.rate_limit import (
+    GraphQLCostThrottle,
+    RestRateLimiter,
+    backoff_delay,
+    is_throttled,
+    retry_after_seconds,
+)
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (10, 60)  # (connect, read) seconds
+DEFAULT_MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Safe to resend after a 5xx or a dropped connection. Anything else (POST
+# creates, GraphQL mutations) may already have been applied, so it is only
+# retried on 429, which Shopify returns before doing any work, or when the
+# connection failed before the request was sent.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def connect_failed(exc):
+    """True if a requests ConnectionError happened before the request was sent."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def is_mutation(query):
+    """True for a GraphQL mutation document (anything that may change data)."""
+    return query.lstrip().startswith("mutation")
+
+
+class ShopifyClient:
+    """
+    Keep-alive HTTP client for the Shopify Admin API.
+
+    One client holds one requests.Session with a sized connection pool, so
+    every helper that shares it reuses the same few TCP/TLS connections
+    instead of opening a new one per call.
+
+    REST calls are paced by a RestRateLimiter fed from Shopify's call-limit
+    header, and 429/5xx responses (plus connection failures) are retried
+    with jittered backoff, honouring Retry-After when Shopify sends it.
+    Non-idempotent requests are only retried when they cannot have been
+    applied: on 429 or a failure to connect.
+    GraphQL calls made through graphql() are paced by a GraphQLCostThrottle
+    instead, and THROTTLED responses are retried once the bucket refills.
+
+    Args:
+        store_url (str): Store base URL, e.g. "https://my-store.myshopify.com".
+        access_token (str): Admin API access token.
+        api_version (str): Admin API version, e.g. "2023-10".
+        pool_size (int): Maximum number of pooled connections to the store.
+        timeout (float | tuple): Default (connect, read) timeout per request.
+        rate_limiter (RestRateLimiter): Bucket model to pace REST calls; pass
+            a shared one when several clients hit the same store.
+        cost_throttle (GraphQLCostThrottle): Query-cost bucket model for graphql().
+        max_retries (int): Retries for 429/5xx, THROTTLED and connection errors.
+    """
+
+    def __init__(self, store_url=None, access_token=None, api_version=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 rate_limiter=None, cost_throttle=None, max_retries=DEFAULT_MAX_RETRIES):
+        self.store_url = (store_url or os.getenv("SHOPIFY_STORE_URL") or "").rstrip("/")
+        self.api_version = api_version or os.getenv("SHOPIFY_API_VERSION", "2023-10")
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RestRateLimiter()
+        self.cost_throttle = cost_throttle or GraphQLCostThrottle()
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "X-Shopify-Access-Token": access_token or os.getenv("SHOPIFY_ACCESS_TOKEN"),
+        })
+
+    @property
+    def base_url(self):
+        """Admin API root for this store and version."""
+        return f"{self.store_url}/admin/api/{self.api_version}"
+
+    def url(self, path):
+        """Resolve an API-relative path ("products.json"); absolute URLs pass through."""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a request through the pooled session, paced and retried.
+
+        `idempotent` defaults to the method's semantics; graphql() passes
+        True for read-only queries so that they are retried on 5xx too.
+
+        Returns the final response; a 429/5xx is returned as-is once the
+        retries are used up, and a connection error is re-raised.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+        is_rest = not url.endswith("/graphql.json")
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        for attempt in range(self.max_retries + 1):
+            if is_rest:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                if attempt == self.max_retries or not (idempotent or connect_failed(e)):
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            if is_rest:
+                self.rate_limiter.update(response)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            if response.status_code != 429 and not idempotent:
+                return response  # may already have been applied
+
+            if response.status_code == 429:
+                delay = retry_after_seconds(response, default=backoff_delay(attempt))
+                if is_rest:
+                    self.rate_limiter.penalize()
+            else:
+                delay = backoff_delay(attempt)
+            print(f"⏳ {method} {path} returned {response.status_code}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def graphql(self, query, variables=None):
+        """
+        Run a GraphQL query, paced by query cost and retried when THROTTLED.
+
+        Returns the decoded response body; raises requests' HTTPError for a
+        non-2xx status left after the transport-level retries.
+        """
+        payload = {"query": query, "variables": variables or {}}
+        for attempt in range(self.max_retries + 1):
+            self.cost_throttle.wait_for(query)
+            response = self.post("graphql.json", json=payload, idempotent=not is_mutation(query))
+            response.raise_for_status()
+            body = response.json()
+            self.cost_throttle.update(query, body)
+            if not is_throttled(body) or attempt == self.max_retries:
+                return body
+
+            delay = self.cost_throttle.throttled_delay(query) + backoff_delay(0)
+            print(f"⏳ GraphQL query throttled; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+
+
+def get_default_client():
+    """Return the process-wide client built from .env, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        _default_client = ShopifyClient()
+    return _default_client
+
+
+def set_default_client(client):
+    """Replace the process-wide client (e.g. to change pool size or timeouts)."""
+    global _default_client
+    _default_client = client
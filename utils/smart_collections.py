@@ -0,0 +1,134 @@
+from utils.shopify_api import graphql_query, paginate_rest
+from utils.shopify_client import get_default_client
+from utils.staged_uploads import product_gid
+
+# Collections whose page_sku.csv members are exactly the products sharing
+# one Category, Brand or Subcategory value in sku_master.csv are created as
+# smart collections with a matching rule. Shopify then keeps them filled,
+# new products included, and no per-product membership call is needed.
+
+# sku_master.csv column -> smart collection rule column, in order of preference.
+# Subcategory has no product field of its own; products of a tag-rule
+# collection get it added as a tag (add_product_tags, merged with their
+# existing tags).
+RULE_COLUMNS = {
+    "Category": "type",
+    "Brand": "vendor",
+    "Subcategory": "tag",
+}
+
+
+TAGS_ADD_MUTATION = """
+mutation tagsAdd($id: ID!, $tags: [String!]!) {
+  tagsAdd(id: $id, tags: $tags) {
+    node { id }
+    userErrors { field message }
+  }
+}
+"""
+
+
+def detect_collection_rules(page_sku_df, products_df):
+    """
+    Find the collections whose membership a single rule reproduces.
+
+    Args:
+        page_sku_df (DataFrame): The whole page_sku.csv.
+        products_df (DataFrame): The whole sku_master.csv.
+
+    Returns:
+        dict: Page Name -> list of smart collection rules, e.g.
+        [{"column": "type", "relation": "equals", "condition": "Lingerie"}].
+    """
+    products = products_df.set_index("SKU")
+    rules = {}
+    for page_name, skus in page_sku_df.groupby("Page Name")["SKU"]:
+        skus = set(skus)
+        if not skus <= set(products.index):
+            continue  # a SKU without a sku_master.csv row cannot be matched by a rule
+        for column, rule_column in RULE_COLUMNS.items():
+            if column not in products.columns:
+                continue
+            values = products.loc[list(skus), column].dropna().astype(str).str.strip().unique()
+            if len(values) != 1 or not values[0]:
+                continue
+            matching = set(products.index[products[column].astype(str).str.strip() == values[0]])
+            if matching == skus:
+                rules[page_name] = [{"column": rule_column, "relation": "equals", "condition": values[0]}]
+                break
+    return rules
+
+
+def smart_collection_payload(collection_data, rules):
+    """REST body for creating a smart collection from a page_url.csv row and its rules."""
+    return {
+        "smart_collection": {
+            "title": collection_data["Page Name"],
+            "handle": collection_data["URL Slug"],
+            "rules": rules,
+            "disjunctive": False
+        }
+    }
+
+
+def create_smart_collection(collection_data, rules, client=None):
+    """Create a smart collection."""
+    client = client or get_default_client()
+    response = client.post("smart_collections.json", json=smart_collection_payload(collection_data, rules))
+    return response.json()
+
+
+def update_smart_collection(collection_id, collection_data, rules, client=None):
+    """Update an existing smart collection's title, handle and rules."""
+    client = client or get_default_client()
+    url = f"smart_collections/{collection_id}.json"
+    response = client.put(url, json=smart_collection_payload(collection_data, rules))
+    return response.json()
+
+
+def load_smart_collections(client=None):
+    """
+    List the store's smart collections once.
+
+    Returns:
+        dict: Lower-cased title -> {"id", "rules"}.
+    """
+    collections = {}
+    for collection in paginate_rest("smart_collections.json", "smart_collections",
+                                    params={"fields": "id,title,rules"}, client=client):
+        collections[collection["title"].lower()] = {"id": collection["id"],
+                                                    "rules": collection.get("rules", [])}
+    return collections
+
+
+def same_rules(current, wanted):
+    """True if a smart collection's rules already match `wanted` (order and case aside)."""
+    def key(rules):
+        return sorted((r["column"], r["relation"], str(r["condition"]).lower()) for r in rules)
+    return key(current) == key(wanted)
+
+
+def rule_tags(rules):
+    """The tag conditions among smart collection rules."""
+    return {str(rule["condition"]) for rule in rules if rule["column"] == "tag"}
+
+
+def subcategory_tag(product_data):
+    """A sku_master.csv row's Subcategory, stripped, or None when blank."""
+    subcategory = product_data.get("Subcategory", "")
+    # Blank CSV cells arrive as NaN
+    return subcategory.strip() if isinstance(subcategory, str) and subcategory.strip() else None
+
+
+def add_product_tags(product_id, tags, client=None):
+    """Add tags to a product, keeping the tags it already has. Returns True on success."""
+    result = graphql_query(TAGS_ADD_MUTATION, {"id": product_gid(product_id), "tags": list(tags)},
+                           client=client)
+    if "errors" in result:
+        print(f"❌ tagsAdd failed for product {product_id}: {result['errors']}")
+        return False
+    errors = result["data"]["tagsAdd"]["userErrors"]
+    if errors:
+        print(f"❌ tagsAdd failed for product {product_id}: {errors}")
+        return False
+    return True
@@ -0,0 +1,176 @@
+import mimetypes
+import os
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.shopify_api import graphql_query
+from utils.shopify_client import DEFAULT_TIMEOUT
+
+# Product images via GraphQL staged uploads: stagedUploadsCreate hands out
+# signed upload targets, file bytes are PUT there straight from disk (no
+# base64, no JSON), and productCreateMedia attaches every staged file of a
+# product in one mutation.
+
+STAGED_UPLOADS_CREATE_MUTATION = """
+mutation stagedUploadsCreate($input: [StagedUploadInput!]!) {
+  stagedUploadsCreate(input: $input) {
+    stagedTargets {
+      url
+      resourceUrl
+      parameters { name value }
+    }
+    userErrors { field message }
+  }
+}
+"""
+
+PRODUCT_CREATE_MEDIA_MUTATION = """
+mutation productCreateMedia($productId: ID!, $media: [CreateMediaInput!]!) {
+  productCreateMedia(productId: $productId, media: $media) {
+    media {
+      id
+      alt
+      status
+      preview { image { url } }
+    }
+    mediaUserErrors { field message }
+  }
+}
+"""
+
+# Separate session for the staging host: it must never see the store's
+# access token, which the ShopifyClient session sends on every request.
+_staging_session = None
+
+
+def staging_session():
+    global _staging_session
+    if _staging_session is None:
+        _staging_session = requests.Session()
+        _staging_session.mount("https://", HTTPAdapter(pool_maxsize=10))
+    return _staging_session
+
+
+def product_gid(product_id):
+    """GraphQL ID for a REST product ID (GraphQL IDs pass through)."""
+    product_id = str(product_id)
+    if product_id.startswith("gid://"):
+        return product_id
+    return f"gid://shopify/Product/{product_id}"
+
+
+def create_staged_targets(paths, client=None):
+    """
+    Reserve one staged upload target per file, in a single mutation.
+
+    Returns:
+        list: Target dicts (url, resourceUrl, parameters) in `paths` order,
+        or None if Shopify rejected the request.
+    """
+    upload_input = [
+        {
+            "filename": os.path.basename(path),
+            "mimeType": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "fileSize": str(os.path.getsize(path)),
+            "resource": "IMAGE",
+            "httpMethod": "PUT",
+        }
+        for path in paths
+    ]
+    result = graphql_query(STAGED_UPLOADS_CREATE_MUTATION, {"input": upload_input}, client=client)
+    if "errors" in result:
+        print(f"❌ stagedUploadsCreate failed: {result['errors']}")
+        return None
+    payload = result["data"]["stagedUploadsCreate"]
+    if payload["userErrors"]:
+        print(f"❌ stagedUploadsCreate failed: {payload['userErrors']}")
+        return None
+    return payload["stagedTargets"]
+
+
+def upload_to_staged_target(target, path):
+    """
+    Stream a file to its staged target. The open file object is handed to
+    requests as the body, so it goes out in chunks and never sits in memory
+    whole. Returns True on success.
+    """
+    headers = {param["name"]: param["value"] for param in target["parameters"]}
+    with open(path, "rb") as f:
+        response = staging_session().put(target["url"], data=f, headers=headers,
+                                         timeout=DEFAULT_TIMEOUT)
+    if response.status_code not in (200, 201, 204):
+        print(f"❌ Staged upload failed for {path}: {response.status_code}")
+        return False
+    return True
+
+
+def attach_media(product_id, media, client=None):
+    """
+    Attach staged files to a product in one productCreateMedia mutation.
+
+    Args:
+        product_id: REST or GraphQL product ID.
+        media (list): (resourceUrl, alt text) pairs, in display order.
+
+    Returns:
+        list: Created media dicts (id, alt, status, preview), or None on failure.
+    """
+    variables = {
+        "productId": product_gid(product_id),
+        "media": [
+            {"originalSource": resource_url, "alt": alt, "mediaContentType": "IMAGE"}
+            for resource_url, alt in media
+        ],
+    }
+    result = graphql_query(PRODUCT_CREATE_MEDIA_MUTATION, variables, client=client)
+    if "errors" in result:
+        print(f"❌ productCreateMedia failed: {result['errors']}")
+        return None
+    payload = result["data"]["productCreateMedia"]
+    if payload["mediaUserErrors"]:
+        print(f"❌ productCreateMedia failed: {payload['mediaUserErrors']}")
+        return None
+    return payload["media"]
+
+
+def upload_product_images_staged(product_id, images, client=None):
+    """
+    Upload a product's local images through staged uploads.
+
+    One stagedUploadsCreate for all files, one streamed PUT per file, then
+    one productCreateMedia for everything that was staged. Missing files
+    and files that fail to stage are left out and reported as None.
+
+    Args:
+        product_id: REST or GraphQL product ID.
+        images (list): (local path, alt text) pairs, in display order.
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        list: One entry per input image: the created media dict, or None.
+    """
+    results = [None] * len(images)
+    present = [i for i, (path, _) in enumerate(images) if os.path.isfile(path)]
+    for i, (path, _) in enumerate(images):
+        if i not in present:
+            print(f"❌ File not found: {path}")
+    if not present:
+        return results
+
+    targets = create_staged_targets([images[i][0] for i in present], client=client)
+    if targets is None:
+        return results
+
+    staged = [i for i, target in zip(present, targets) if upload_to_staged_target(target, images[i][0])]
+    resource_urls = {i: target["resourceUrl"] for i, target in zip(present, targets)}
+    if not staged:
+        return results
+    created = attach_media(product_id, [(resource_urls[i], images[i][1]) for i in staged],
+                           client=client)
+    if created is None:
+        return results
+
+    for i, media in zip(staged, created):
+        results[i] = media
+        print(f"Uploaded {images[i][0]} via staged upload (ALT: {images[i][1]})")
+    return results
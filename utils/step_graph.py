@@ -0,0 +1,158 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class Step:
+    """One unit of a deploy: a function plus the named artifacts it consumes and produces."""
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.started = None
+        self.finished = None
+        self.status = "pending"
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class StepGraph:
+    """
+    Dependency graph of deploy steps, run with as much overlap as the data allows.
+
+    Each step declares the artifacts it reads (`inputs`) and writes
+    (`outputs`). A step is submitted to the thread pool the moment every
+    input exists, so independent branches (e.g. theme uploads vs. catalog
+    rows) run side by side. A step function receives its inputs as keyword
+    arguments and returns a dict with a value for each declared output (or
+    None when it declares none). If a step fails, the steps
+    downstream of it are skipped and independent branches carry on.
+
+    Usage:
+        graph = StepGraph()
+
+        @graph.step("Load CSVs", outputs=["products_df"])
+        def load_csvs(): ...
+
+        graph.run(max_workers=4)
+    """
+
+    def __init__(self):
+        self.steps = []
+
+    def step(self, name, inputs=(), outputs=()):
+        """Decorator that registers a function as a step."""
+        def register(func):
+            self.add(Step(name, func, inputs, outputs))
+            return func
+        return register
+
+    def add(self, step):
+        produced = {out for s in self.steps for out in s.outputs}
+        clash = produced.intersection(step.outputs)
+        if clash:
+            raise ValueError(f"Step '{step.name}' re-declares outputs {sorted(clash)}")
+        self.steps.append(step)
+
+    def producers(self, step):
+        """Steps whose outputs `step` consumes."""
+        return [s for s in self.steps if set(s.outputs) & set(step.inputs)]
+
+    def _validate(self, available):
+        produced = set(available).union(out for s in self.steps for out in s.outputs)
+        for step in self.steps:
+            missing = set(step.inputs) - produced
+            if missing:
+                raise ValueError(f"Step '{step.name}' needs {sorted(missing)}, which no step produces")
+
+    def run(self, max_workers=4, artifacts=None):
+        """
+        Run every step, respecting dependencies, and print a summary.
+
+        Args:
+            max_workers (int): Steps allowed to run at the same time.
+            artifacts (dict): Artifacts available before any step runs.
+
+        Returns:
+            dict: Every artifact produced by the run.
+        """
+        artifacts = dict(artifacts or {})
+        self._validate(artifacts)
+        pending = list(self.steps)
+        running = {}
+        run_started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                for step in list(pending):
+                    if any(p.status in ("failed", "skipped") for p in self.producers(step)):
+                        step.status = "skipped"
+                        pending.remove(step)
+                        print(f"⏭️ Skipping '{step.name}' (an upstream step failed)")
+                    elif all(name in artifacts for name in step.inputs):
+                        step.status = "running"
+                        step.started = time.monotonic()
+                        pending.remove(step)
+                        kwargs = {name: artifacts[name] for name in step.inputs}
+                        running[pool.submit(step.func, **kwargs)] = step
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    step.finished = time.monotonic()
+                    try:
+                        artifacts.update(self._collect_outputs(step, future.result()))
+                        step.status = "done"
+                    except Exception as e:
+                        step.status = "failed"
+                        print(f"❌ Step '{step.name}' failed: {e}")
+
+        for step in pending:
+            step.status = "blocked"
+            print(f"⚠️ '{step.name}' never became runnable (dependency cycle?)")
+
+        self.report(time.monotonic() - run_started)
+        return artifacts
+
+    @staticmethod
+    def _collect_outputs(step, result):
+        missing = set(step.outputs) - set(result or {})
+        if missing:
+            raise ValueError(f"did not return outputs {sorted(missing)}")
+        return {name: result[name] for name in step.outputs}
+
+    def critical_path(self):
+        """
+        Longest chain of dependent steps by measured duration.
+
+        Returns:
+            tuple: (list of steps on the path, total seconds along it).
+        """
+        best = {}  # step name -> (path seconds, path)
+
+        def longest(step):
+            if step.name not in best:
+                best[step.name] = (0.0, [])  # guards against cycles
+                chains = [longest(p) for p in self.producers(step)]
+                seconds, path = max(chains, key=lambda c: c[0], default=(0.0, []))
+                best[step.name] = (seconds + step.duration, path + [step])
+            return best[step.name]
+
+        results = [longest(s) for s in self.steps]
+        seconds, path = max(results, key=lambda c: c[0], default=(0.0, []))
+        return path, seconds
+
+    def report(self, wall_seconds):
+        print("\n⏱️ Step Summary:")
+        for step in self.steps:
+            print(f" - {step.name}: {step.status} ({step.duration:.1f}s)")
+        path, seconds = self.critical_path()
+        print(f"🧵 Critical path ({seconds:.1f}s of {wall_seconds:.1f}s wall clock): "
+              + " → ".join(s.name for s in path))
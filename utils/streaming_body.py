@@ -0,0 +1,80 @@
+import asyncio
+import base64
+import json
+import os
+
+# Raw bytes read per step; a multiple of 3 so every chunk encodes to
+# base64 on its own without padding in the middle of the stream.
+CHUNK_SIZE = 3 * 64 * 1024
+
+_PLACEHOLDER = "\x00ATTACHMENT\x00"
+
+
+class Base64JsonBody:
+    """
+    JSON request body with one base64 field streamed from a file.
+
+    `payload` is an ordinary JSON-able dict in which one value is the
+    placeholder returned by `Base64JsonBody.ATTACHMENT`. Iterating the body
+    yields the JSON text before that value, then the file's base64 chunk by
+    chunk, then the rest, so memory use stays near CHUNK_SIZE whatever the
+    file size. The body has a known length, so requests sends a normal
+    Content-Length instead of chunked encoding. Each iteration reopens the
+    file, so a retried request sends the whole body again. httpx's
+    AsyncClient takes `aiter_bytes()` instead (AsyncShopifyClient does
+    this itself, per attempt).
+
+    Usage:
+        body = Base64JsonBody(path, {"asset": {"key": key, "attachment": Base64JsonBody.ATTACHMENT}})
+        client.put(url, data=body)
+
+    Args:
+        path (str): File to encode.
+        payload (dict): JSON payload holding ATTACHMENT exactly once.
+        chunk_size (int): Raw bytes per read; must be a multiple of 3.
+    """
+
+    ATTACHMENT = _PLACEHOLDER
+
+    def __init__(self, path, payload, chunk_size=CHUNK_SIZE):
+        if chunk_size % 3:
+            raise ValueError("chunk_size must be a multiple of 3")
+        self.path = path
+        self.chunk_size = chunk_size
+        text = json.dumps(payload)
+        marker = json.dumps(_PLACEHOLDER)[1:-1]  # as it appears inside the JSON string
+        if text.count(marker) != 1:
+            raise ValueError("payload must contain Base64JsonBody.ATTACHMENT exactly once")
+        head, tail = text.split(marker)
+        self._head = head.encode("utf-8")
+        self._tail = tail.encode("utf-8")
+        self._encoded_size = 4 * ((os.path.getsize(path) + 2) // 3)
+
+    def __len__(self):
+        return len(self._head) + self._encoded_size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                yield base64.b64encode(chunk)
+        yield self._tail
+
+    async def aiter_bytes(self):
+        """Async counterpart of iterating the body; file reads run in a worker thread."""
+        yield self._head
+        with open(self.path, "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, self.chunk_size):
+                yield base64.b64encode(chunk)
+        yield self._tail
+
+
+def asset_attachment_body(key, path):
+    """Streaming body for a theme asset PUT with a binary attachment."""
+    return Base64JsonBody(path, {"asset": {"key": key, "attachment": Base64JsonBody.ATTACHMENT}})
+
+
+def product_image_body(path, position, alt):
+    """Streaming body for a REST products/{id}/images.json POST."""
+    return Base64JsonBody(path, {"image": {"attachment": Base64JsonBody.ATTACHMENT,
+                                           "position": position, "alt": alt}})
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+
+from utils.shopify_client import get_default_client
+from utils.theme_sync import TEXT_EXTENSIONS
+
+# Local copy of a live theme for the read-modify-write helpers. Files sit
+# under <root>/<asset key> (the same layout as ASI_FILES or
+# TT_FILES/shopify_theme); <root>/.mirror.json records each file's
+# updated_at, checksum and ETag so stale copies are refetched.
+
+INDEX_FILE = ".mirror.json"
+
+
+def default_mirror_root(theme_id):
+    return os.path.join(os.getenv("FOLDER") or ".", ".theme_mirror", str(theme_id))
+
+
+class ThemeMirror:
+    """
+    Keyed cache of one theme's text files, validated against Shopify.
+
+    pull() lists the theme once and refetches only files whose updated_at
+    changed since they were mirrored. get() serves a file from disk when it
+    was validated this run, and otherwise revalidates it with a conditional
+    GET (If-None-Match on the stored ETag). put() uploads and updates the
+    mirror, so a later get() of the same key costs nothing.
+
+    Args:
+        theme_id (str): Theme to mirror.
+        root (str): Mirror folder; defaults to <FOLDER>/.theme_mirror/<theme_id>.
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+    """
+
+    def __init__(self, theme_id, root=None, client=None):
+        self.theme_id = str(theme_id)
+        self.root = root or default_mirror_root(theme_id)
+        self.client = client
+        self._lock = threading.RLock()
+        self._fresh = set()  # keys known to match Shopify during this run
+        self._index = {}
+        index_path = os.path.join(self.root, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+
+    @property
+    def url(self):
+        return f"themes/{self.theme_id}/assets.json"
+
+    def _client(self, client=None):
+        return client or self.client or get_default_client()
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def _store(self, key, value, meta):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(value)
+        self._index[key] = meta
+        self._fresh.add(key)
+        self._save_index()
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=2, sort_keys=True)
+
+    def _read(self, key):
+        with open(self._path(key), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def pull(self, keys=None, client=None):
+        """
+        Bring the mirror up to date with one assets.json listing.
+
+        Args:
+            keys (iterable): Keys to mirror; defaults to every text file of the theme.
+            client (ShopifyClient): Overrides the mirror's client for this call.
+
+        Returns:
+            bool: True if the listing and every refetch succeeded.
+        """
+        response = self._client(client).get(self.url, params={"fields": "key,updated_at,checksum"})
+        if response.status_code != 200:
+            print(f"❌ Failed to list theme {self.theme_id}: {response.status_code}")
+            return False
+        remote = {asset["key"]: asset for asset in response.json().get("assets", [])}
+        if keys is None:
+            keys = [k for k in remote if os.path.splitext(k)[1].lower() in TEXT_EXTENSIONS]
+
+        ok, fetched, cached = True, 0, 0
+        with self._lock:
+            for key in keys:
+                if key not in remote:
+                    continue
+                known = self._index.get(key, {})
+                if known.get("updated_at") == remote[key].get("updated_at") and os.path.exists(self._path(key)):
+                    self._fresh.add(key)
+                    cached += 1
+                elif self._fetch(key, client) is None:
+                    ok = False
+                else:
+                    fetched += 1
+        print(f"🪞 Theme mirror: {fetched} file(s) fetched, {cached} already current")
+        return ok
+
+    def _fetch(self, key, client=None):
+        """GET one file (conditionally, if an ETag is stored); returns its text or None."""
+        known = self._index.get(key, {})
+        headers = {}
+        if known.get("etag") and os.path.exists(self._path(key)):
+            headers["If-None-Match"] = known["etag"]
+        response = self._client(client).get(self.url, params={"asset[key]": key}, headers=headers)
+
+        if response.status_code == 304:
+            self._fresh.add(key)
+            return self._read(key)
+        if response.status_code != 200:
+            print(f"❌ Failed to fetch {key}: {response.status_code}")
+            return None
+        asset = response.json().get("asset", {})
+        value = asset.get("value")
+        if value is None:
+            print(f"⚠️ {key} is not a text file; not mirrored")
+            return None
+        self._store(key, value, {
+            "updated_at": asset.get("updated_at"),
+            "checksum": asset.get("checksum"),
+            "etag": response.headers.get("ETag"),
+        })
+        return value
+
+    def get(self, key, client=None):
+        """A theme file's text, from the mirror when it is known to be current. None on failure."""
+        with self._lock:
+            if key in self._fresh:
+                return self._read(key)
+            return self._fetch(key, client)
+
+    def put(self, key, value, client=None):
+        """Upload a text file and keep the mirror in step. Returns True on success."""
+        response = self._client(client).put(self.url, json={"asset": {"key": key, "value": value}})
+        if response.status_code != 200:
+            print(f"❌ Failed to upload {key}: {response.status_code}")
+            return False
+        asset = response.json().get("asset", {})
+        with self._lock:
+            self._store(key, value, {
+                "updated_at": asset.get("updated_at"),
+                "checksum": asset.get("checksum"),
+                "etag": None,  # the next conditional GET learns the new ETag
+            })
+        return True
+
+
+_MIRRORS = {}
+_MIRRORS_LOCK = threading.Lock()
+
+
+def get_theme_mirror(theme_id=None, client=None):
+    """The shared ThemeMirror for a theme (THEME_ID from .env by default)."""
+    theme_id = str(theme_id or os.getenv("THEME_ID"))
+    with _MIRRORS_LOCK:
+        if theme_id not in _MIRRORS:
+            _MIRRORS[theme_id] = ThemeMirror(theme_id, client=client)
+        return _MIRRORS[theme_id]
@@ -0,0 +1,158 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.shopify_client import get_default_client
+from utils.streaming_body import asset_attachment_body
+
+# Folders of a theme directory that map onto asset keys ("sections/x.liquid")
+THEME_FOLDERS = ("assets", "config", "layout", "locales", "sections", "snippets", "templates")
+
+# Uploaded as "value"; everything else goes up base64-encoded as "attachment"
+TEXT_EXTENSIONS = {".liquid", ".json", ".css", ".scss", ".js", ".svg", ".txt", ".html"}
+
+# Never deleted by a sync, even if missing locally
+PROTECTED_KEYS = {"layout/theme.liquid", "config/settings_schema.json", "config/settings_data.json"}
+
+
+def md5_checksum(path):
+    """MD5 hex digest of a file, the same form Shopify reports as an asset's `checksum`."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_theme_files(theme_dir):
+    """Asset key -> local path for every file under the theme folders of `theme_dir`."""
+    files = {}
+    for folder in THEME_FOLDERS:
+        root = os.path.join(theme_dir, folder)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, theme_dir).replace(os.sep, "/")
+                files[key] = path
+    return files
+
+
+def remote_asset_checksums(theme_id, client=None):
+    """
+    Asset key -> checksum for every file of a theme, from one assets.json listing.
+
+    Shopify leaves `checksum` null for assets it has not rehashed recently;
+    those map to None and are treated as changed.
+
+    Returns:
+        dict: Key -> checksum, or None if the listing failed.
+    """
+    client = client or get_default_client()
+    response = client.get(f"themes/{theme_id}/assets.json",
+                          params={"fields": "key,checksum,updated_at"})
+    if response.status_code != 200:
+        print(f"❌ Failed to list theme assets: {response.status_code}")
+        return None
+    return {asset["key"]: asset.get("checksum") for asset in response.json().get("assets", [])}
+
+
+def asset_body(key, path):
+    """
+    requests keyword arguments that upload `path` as theme asset `key`:
+    json= with a "value" for text files, a streamed base64 data= body otherwise.
+    """
+    if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS:
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            return {"json": {"asset": {"key": key, "value": data.decode("utf-8")}}}
+        except UnicodeDecodeError:
+            pass
+    return {"data": asset_attachment_body(key, path)}
+
+
+def local_theme_folders(theme_dir):
+    """The theme folders that exist under `theme_dir`."""
+    return {folder for folder in THEME_FOLDERS if os.path.isdir(os.path.join(theme_dir, folder))}
+
+
+def plan_sync(local_files, remote_checksums, delete=False, local_folders=()):
+    """
+    Compare local files with the remote listing.
+
+    Only remote keys under one of `local_folders` are deleted: a folder the
+    local theme does not have at all (e.g. a FOLDER with only assets/) is
+    not managed locally, so its remote files are left alone.
+
+    Returns:
+        tuple: (keys to upload, number unchanged, keys to delete).
+    """
+    upload, unchanged = [], 0
+    for key, path in sorted(local_files.items()):
+        if remote_checksums.get(key) == md5_checksum(path):
+            unchanged += 1
+        else:
+            upload.append(key)
+
+    removed = []
+    if delete:
+        removed = sorted(
+            key for key in remote_checksums
+            if key not in local_files and key not in PROTECTED_KEYS
+            and key.split("/", 1)[0] in local_folders
+        )
+    return upload, unchanged, removed
+
+
+def sync_theme(theme_dir, theme_id, delete=False, dry_run=False, workers=4, client=None):
+    """
+    Push a local theme directory, uploading only new or changed files.
+
+    Args:
+        theme_dir (str): Folder holding assets/, layout/, sections/, ...
+        theme_id (str): Target theme.
+        delete (bool): Also delete remote files that no longer exist locally.
+        dry_run (bool): Print the plan without changing the theme.
+        workers (int): Uploads in flight at once (all paced by the client's limiter).
+        client (ShopifyClient): Client to send through; defaults to the shared one.
+
+    Returns:
+        bool: True if every upload and delete succeeded.
+    """
+    client = client or get_default_client()
+    remote = remote_asset_checksums(theme_id, client=client)
+    if remote is None:
+        return False
+
+    local_files = local_theme_files(theme_dir)
+    upload, unchanged, removed = plan_sync(local_files, remote, delete=delete,
+                                           local_folders=local_theme_folders(theme_dir))
+    print(f"🔄 Theme sync: {len(upload)} to upload, {unchanged} unchanged, {len(removed)} to delete")
+    if dry_run:
+        for key in upload:
+            print(f" + {key}")
+        for key in removed:
+            print(f" - {key}")
+        return True
+
+    url = f"themes/{theme_id}/assets.json"
+
+    def push(key):
+        response = client.put(url, **asset_body(key, local_files[key]))
+        if response.status_code != 200:
+            print(f"❌ Upload failed: {key} ({response.status_code})")
+            return False
+        print(f"✅ Uploaded {key}")
+        return True
+
+    def remove(key):
+        response = client.delete(url, params={"asset[key]": key})
+        if response.status_code != 200:
+            print(f"❌ Delete failed: {key} ({response.status_code})")
+            return False
+        print(f"🗑️ Deleted {key}")
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(push, upload)) + list(pool.map(remove, removed))
+    return all(results)
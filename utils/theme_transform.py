@@ -0,0 +1,61 @@
+import os
+
+from utils.theme_mirror import get_theme_mirror
+
+# Edits to one theme file are collected as pure str -> str injectors and
+# applied together: the file is read once (from the theme mirror), every
+# injector runs in memory, and it is uploaded once, only if it changed.
+
+
+class ThemeTransform:
+    """
+    Ordered pipeline of injectors for a single theme file.
+
+    Usage:
+        transform = ThemeTransform("layout/theme.liquid")
+        transform.register(inject_favicon_into_theme, "favicon.ico")
+        transform.register(inject_button_styles)
+        transform.run()
+
+    Args:
+        key (str): Asset key of the file to edit.
+        theme_id (str): Theme holding it; defaults to THEME_ID from .env.
+    """
+
+    def __init__(self, key="layout/theme.liquid", theme_id=None):
+        self.key = key
+        self.theme_id = theme_id or os.getenv("THEME_ID")
+        self.injectors = []
+
+    def register(self, injector, *args, **kwargs):
+        """Add `injector(content, *args, **kwargs) -> content`; returns self so calls chain."""
+        self.injectors.append((injector, args, kwargs))
+        return self
+
+    def apply(self, content):
+        """Run every injector, in registration order, over `content`."""
+        for injector, args, kwargs in self.injectors:
+            content = injector(content, *args, **kwargs)
+        return content
+
+    def run(self, client=None):
+        """
+        Fetch the file, apply the pipeline and upload the result if it differs.
+
+        Returns:
+            bool: True if the file is now up to date (uploaded or already unchanged).
+        """
+        mirror = get_theme_mirror(self.theme_id)
+        content = mirror.get(self.key, client=client)
+        if content is None:
+            print(f"❌ Failed to fetch {self.key}")
+            return False
+
+        updated = self.apply(content)
+        if updated == content:
+            print(f"ℹ️ {self.key} already up to date ({len(self.injectors)} injector(s))")
+            return True
+        if mirror.put(self.key, updated, client=client):
+            print(f"✅ {self.key} updated ({len(self.injectors)} injector(s), one upload)")
+            return True
+        return False
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Thread pool for per-product upload work. One task owns all of a product's
+# images, so order inside a product is kept while many products upload at
+# once. Every task goes through the shared ShopifyClient, so the pool is
+# paced by the same REST limiter and GraphQL cost throttle as everything else.
+
+DEFAULT_UPLOAD_WORKERS = 4
+
+
+class ThroughputMeter:
+    """
+    Thread-safe images/s and MB/s counter that prints at most every `interval` seconds.
+
+    Args:
+        label (str): Prefix for the printed lines.
+        total (int): Expected number of tasks, for a progress count.
+        interval (float): Seconds between progress lines.
+    """
+
+    def __init__(self, label, total=None, interval=2.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.tasks = 0
+        self.images = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_print = self._started
+
+    def add(self, images=0, nbytes=0, tasks=1):
+        with self._lock:
+            self.tasks += tasks
+            self.images += images
+            self.bytes += nbytes
+            now = time.monotonic()
+            if now - self._last_print >= self.interval:
+                self._last_print = now
+                print(self._line(now))
+
+    def _line(self, now):
+        elapsed = max(now - self._started, 1e-9)
+        progress = f"{self.tasks}/{self.total}" if self.total is not None else str(self.tasks)
+        return (f"📈 {self.label}: {progress} done, {self.images / elapsed:.1f} images/s, "
+                f"{self.bytes / elapsed / 1_000_000:.2f} MB/s")
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        print(self._line(time.monotonic()) + f" ({self.images} image(s), "
+              f"{self.bytes / 1_000_000:.1f} MB in {elapsed:.1f}s)")
+
+
+def run_in_pool(items, worker, workers=DEFAULT_UPLOAD_WORKERS, label="Uploads"):
+    """
+    Run `worker(item)` for every item on a thread pool.
+
+    A failing item is reported and yields None; it does not stop the rest.
+
+    Returns:
+        list: Worker results in `items` order.
+    """
+    def run_one(item):
+        try:
+            return worker(item)
+        except Exception as e:
+            print(f"❌ {label}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, items))